@@ -0,0 +1,16 @@
+# src/__main__.py
+"""
+Standalone worker entry point: python -m src
+
+Lives here rather than in src/worker.py because spawned transcription processes
+re-import the parent's main module, unless it's a package's __main__. Keeping the
+worker out of __main__ keeps those children on transcriber.py's imports only.
+"""
+import asyncio
+
+from src.logging import setup_logging
+from src.worker import run_workers
+
+if __name__ == "__main__":
+    setup_logging()
+    asyncio.run(run_workers())
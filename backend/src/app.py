@@ -1,42 +1,64 @@
 # app.py
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse, Response
+from starlette.exceptions import HTTPException as StarletteHTTPException
 
-from src.config import settings
+from src.cache import start_cache_sweeper, stop_cache_sweeper
+from src.config import settings, API_VERSION
 from src.routes import router
 from src.logging import setup_logging, get_logger
+from src.middleware import AllowAllCORSMiddleware, VersionMiddleware
+from src.redis_client import close_redis, get_redis
+from src.worker import set_default_executor, start_workers, stop_workers
 
 # Set up centralized logging
 setup_logging()
 logger = get_logger(__name__)
 
 # Create FastAPI app
-app = FastAPI(title="Transcription API", version=settings.API_VERSION)
+app = FastAPI(title="Transcription API", version=settings.API_VERSION, default_response_class=ORJSONResponse)
 
-# Set up CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Check the client's API version on the job routes (/version and /user stay reachable by outdated clients)
+app.add_middleware(VersionMiddleware, version=API_VERSION, paths=("/transcribe", "/jobs"))
+
+# Set up CORS middleware (allow all origins, methods and headers)
+# Added last so it's outermost and version rejections carry CORS headers too
+app.add_middleware(AllowAllCORSMiddleware)
 
 # Include all routes
 app.include_router(router)
 
 
+# Error responses (404, 426, 429...) otherwise go through Starlette's stdlib-json JSONResponse
+@app.exception_handler(StarletteHTTPException)
+async def http_exception_handler(request: Request, exc: StarletteHTTPException) -> Response:
+    headers = getattr(exc, "headers", None)
+    if exc.status_code in (204, 304):
+        return Response(status_code=exc.status_code, headers=headers)
+    return ORJSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=headers)
+
+
 # Startup event
 @app.on_event("startup")
 async def startup_event():
     logger.info(f"Starting Transcription API v{settings.API_VERSION}")
     logger.info(f"Log level: {settings.LOG_LEVEL}")
+    set_default_executor()
+    start_cache_sweeper()
+    if settings.RUN_WORKERS:
+        await start_workers()
+    elif get_redis() is None:
+        # Jobs would sit in this process's in-memory queue with nothing to take them
+        raise RuntimeError("RUN_WORKERS=false requires REDIS_URL, so standalone workers can take the jobs")
 
 
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down Transcription API")
+    await stop_workers()
+    await stop_cache_sweeper()
+    await close_redis()
 
 
 if __name__ == "__main__":
@@ -1,8 +1,19 @@
 # cache.py
+import asyncio
+import heapq
+import itertools
+import threading
 import time
-from typing import Dict, Any, TypeVar, Generic, Optional, Callable, Tuple, Literal
+from collections import OrderedDict
+from typing import Dict, Any, TypeVar, Generic, Optional, Callable, Awaitable, Tuple, Literal, List
 
+import numpy as np
+import orjson
+
+from src.config import settings
 from src.logging import get_logger
+from src.redis_client import get_redis
+from src.utils import CONTENT_HASH_VERSION
 logger = get_logger(__name__)
 
 
@@ -10,25 +21,159 @@ T = TypeVar('T')
 K = TypeVar('K')
 
 
+class _Counter:
+    """
+    Hit/miss counter that can be bumped from any thread without a lock
+
+    itertools.count advances atomically, unlike `n += 1`. Reading the value
+    advances it too, so earlier reads are subtracted; reads are rare (stats only).
+    """
+
+    __slots__ = ("_count", "_reads", "increment")
+
+    def __init__(self):
+        self._count = itertools.count()
+        self._reads = 0
+        self.increment = self._count.__next__
+
+    @property
+    def value(self) -> int:
+        value = next(self._count) - self._reads
+        self._reads += 1
+        return value
+
+
+def _remaining_seconds(pttl: int) -> Optional[float]:
+    """
+    Convert a Redis PTTL reply to the TTL for an in-process copy
+
+    A value read from Redis is only cached in process until its Redis key
+    expires, so it can't outlive an entry that's already gone for other workers.
+    None (the full TTL) when the key has no expiry (-1); -2 means it expired just after being read.
+    """
+    if pttl == -1:
+        return None
+    return max(pttl, 0) / 1000
+
+
+# Pub/sub channel telling every process to drop in-process copies of invalidated or cleared entries
+_INVALIDATION_CHANNEL = f"cache:{CONTENT_HASH_VERSION}:invalidations"
+
+
+class _GetterCancelled(Exception):
+    """Set on a single-flight future when the caller computing the value was cancelled"""
+
+
 class Cache(Generic[K, T]):
-    """Generic cache implementation with TTL support"""
+    """
+    Generic two-tier cache with TTL support
+
+    Entries live in a per-process dict (L1). When Redis is configured they are
+    also written there (L2) with a native expiry, so they're shared across
+    workers and survive restarts; L1 misses fall through to Redis.
 
-    def __init__(self, name: str, ttl_seconds: int = 3600):
+    Reads don't check expiry. Expired L1 entries are removed by sweep(), which
+    walks a heap of expiry times and is run periodically by the cache sweeper.
+    L1 holds at most maxsize entries, evicting the least recently used first.
+
+    L1 changes (including the recency update on a hit) hold a lock so the cache
+    can also be used from executor threads.
+    """
+
+    def __init__(self, name: str, ttl_seconds: int = 3600, redis=None, maxsize: Optional[int] = None):
         """
         Initialize a new cache
 
         Args:
-            name: Name of the cache (for logging)
+            name: Name of the cache (for logging and the Redis key prefix)
             ttl_seconds: Time-to-live in seconds for cache entries
+            redis: Async Redis client for the shared tier, or None for a per-process cache
+            maxsize: Maximum number of in-process entries, or None for no limit
         """
         self.name = name
         self.ttl_seconds = ttl_seconds
-        self.cache: Dict[K, Tuple[T, float]] = {}
-        self.hits = 0
-        self.misses = 0
-        logger.info(f"Initialized {name} cache with TTL of {ttl_seconds} seconds")
+        self.redis = redis
+        self.maxsize = maxsize
+        self._redis_prefix = f"cache:{CONTENT_HASH_VERSION}:{name}:"
+        # Values and their monotonic expiry times, kept in two flat dicts rather than one dict of tuples
+        # Values are kept in recency order for LRU eviction
+        self.cache: OrderedDict[K, T] = OrderedDict()
+        self._expiry: Dict[K, float] = {}
+        # (expiry, key) min-heap; may hold stale entries for keys that were set again or removed
+        self._expiry_heap: List[Tuple[float, K]] = []
+        self._lock = threading.RLock()
+        # Values being computed by get_or_set or compute, so concurrent callers share one computation
+        self._inflight: Dict[K, asyncio.Future] = {}
+        self._hits = _Counter()
+        self._misses = _Counter()
+        logger.info("Initialized %s cache with TTL of %s seconds and max size %s", name, ttl_seconds, maxsize)
+
+    def _redis_key(self, key: K) -> str:
+        return f"{self._redis_prefix}{key}"
+
+    def _get_local(self, key: K) -> Optional[T]:
+        """Get a value from the in-process tier, marking it as recently used"""
+        value = self.cache.get(key)
+        if value is not None:
+            with self._lock:
+                if key in self.cache:
+                    self.cache.move_to_end(key)
+        return value
+
+    def _set_local(self, key: K, value: T, ttl_seconds: Optional[float] = None) -> None:
+        """Store a value in the in-process tier and schedule its expiry (after the cache's TTL by default)"""
+        expiry = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            self.cache[key] = value
+            self.cache.move_to_end(key)
+            self._expiry[key] = expiry
+            heapq.heappush(self._expiry_heap, (expiry, key))
+
+            if self.maxsize is not None and len(self.cache) > self.maxsize:
+                evicted, _ = self.cache.popitem(last=False)
+                del self._expiry[evicted]
+
+            # Evicted and overwritten keys leave stale heap entries behind; rebuild once they dominate
+            if len(self._expiry_heap) > 2 * len(self._expiry) + 64:
+                self._expiry_heap = [(entry_expiry, entry_key) for entry_key, entry_expiry in self._expiry.items()]
+                heapq.heapify(self._expiry_heap)
 
-    def get(self, key: K) -> Optional[T]:
+    def _remove_local(self, key: K) -> None:
+        """Remove a key from the in-process tier, if present"""
+        with self._lock:
+            self.cache.pop(key, None)
+            self._expiry.pop(key, None)
+
+    def sweep(self) -> int:
+        """
+        Remove expired entries from the in-process tier
+
+        Returns:
+            The number of entries removed
+        """
+        now = time.monotonic()
+        removed = 0
+        with self._lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                _, key = heapq.heappop(self._expiry_heap)
+                expiry = self._expiry.get(key)
+                # Skip keys that were removed or set again since this expiry was scheduled
+                if expiry is not None and expiry <= now:
+                    self.cache.pop(key, None)
+                    del self._expiry[key]
+                    removed += 1
+        return removed
+
+    def _record(self, key: K, value: Optional[T]) -> None:
+        """Count a lookup as a hit or miss"""
+        if value is not None:
+            self._hits.increment()
+            logger.debug("%s cache HIT for key: %s", self.name, key)
+        else:
+            self._misses.increment()
+            logger.debug("%s cache MISS for key: %s", self.name, key)
+
+    async def get(self, key: K) -> Optional[T]:
         """
         Get a value from the cache
 
@@ -38,21 +183,21 @@ class Cache(Generic[K, T]):
         Returns:
             The cached value or None if not found or expired
         """
-        if key in self.cache:
-            value, timestamp = self.cache[key]
-            if time.time() - timestamp <= self.ttl_seconds:
-                self.hits += 1
-                logger.debug(f"{self.name} cache HIT for key: {key}")
-                return value
-            else:
-                # Remove expired entry
-                del self.cache[key]
-
-        self.misses += 1
-        logger.debug(f"{self.name} cache MISS for key: {key}")
-        return None
+        value = self._get_local(key)
+        if value is None and self.redis is not None:
+            redis_key = self._redis_key(key)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.get(redis_key)
+                pipe.pttl(redis_key)
+                raw, pttl = await pipe.execute()
+            if raw is not None:
+                value = orjson.loads(raw)
+                self._set_local(key, value, _remaining_seconds(pttl))
+
+        self._record(key, value)
+        return value
 
-    def set(self, key: K, value: T) -> None:
+    async def set(self, key: K, value: T) -> None:
         """
         Set a value in the cache
 
@@ -60,59 +205,347 @@ class Cache(Generic[K, T]):
             key: Cache key
             value: Value to cache
         """
-        self.cache[key] = (value, time.time())
-        logger.debug(f"Added to {self.name} cache: {key}")
+        self._set_local(key, value)
+        if self.redis is not None:
+            await self.redis.set(self._redis_key(key), orjson.dumps(value), ex=self.ttl_seconds)
+        logger.debug("Added to %s cache: %s", self.name, key)
 
-    def get_or_set(self, key: K, getter: Callable[[], T]) -> T:
+    async def get_or_set(self, key: K, getter: Callable[[], Awaitable[Optional[T]]]) -> Optional[T]:
         """
         Get a value from the cache, or compute and store it if not found
+        Concurrent callers missing the same key wait for a single getter call.
 
         Args:
             key: Cache key
-            getter: Function to compute the value if not in cache
+            getter: Coroutine function to compute the value if not in cache (None results aren't cached)
 
         Returns:
             The cached or computed value
         """
-        cached_value = self.get(key)
-        if cached_value is not None:
-            return cached_value
+        return await self._get_or_compute(key, getter, lookup=True)
 
-        value = getter()
-        self.set(key, value)
+    async def compute(self, key: K, getter: Callable[[], Awaitable[Optional[T]]]) -> Optional[T]:
+        """
+        Compute and store a value the caller already looked up (e.g. with get_many) and missed
+        Like get_or_set, but without another Redis lookup or miss count; concurrent
+        callers still share a single getter call.
+
+        Args:
+            key: Cache key
+            getter: Coroutine function to compute the value (None results aren't cached)
+
+        Returns:
+            The computed value, or one another caller stored in the meantime
+        """
+        return await self._get_or_compute(key, getter, lookup=False)
+
+    async def _get_or_compute(self, key: K, getter: Callable[[], Awaitable[Optional[T]]],
+                              lookup: bool) -> Optional[T]:
+        while True:
+            inflight = self._inflight.get(key)
+            if inflight is None:
+                if lookup:
+                    cached_value = await self.get(key)
+                else:
+                    # A computation that finished since the caller's lookup left its value here, for free
+                    cached_value = self._get_local(key)
+                if cached_value is not None:
+                    return cached_value
+                # Another caller may have started computing while the lookup was awaited
+                inflight = self._inflight.get(key)
+            if inflight is None:
+                break
+            try:
+                # Shielded so a cancelled waiter doesn't cancel the computation for everyone else
+                return await asyncio.shield(inflight)
+            except _GetterCancelled:
+                # The caller computing it was cancelled, not this one; look again and maybe compute it here
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        # Retrieve the outcome even when nobody else waited on it, so failures aren't reported as unhandled
+        future.add_done_callback(lambda f: f.exception())
+        self._inflight[key] = future
+        try:
+            value = await getter()
+            if value is not None:
+                await self.set(key, value)
+        except asyncio.CancelledError:
+            # Waiters weren't cancelled themselves, so give them an error they retry on instead
+            future.set_exception(_GetterCancelled())
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._inflight[key]
+
+        future.set_result(value)
         return value
 
-    def invalidate(self, key: K) -> None:
+    async def invalidate(self, key: K) -> None:
         """
         Remove a value from the cache
 
         Args:
             key: Cache key to remove
         """
-        if key in self.cache:
-            del self.cache[key]
-            logger.debug(f"Invalidated {self.name} cache entry: {key}")
+        self._remove_local(key)
+        if self.redis is not None:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.delete(self._redis_key(key))
+                # Other processes drop their in-process copies too (see _invalidation_loop)
+                pipe.publish(_INVALIDATION_CHANNEL, orjson.dumps({"cache": self.name, "key": key}))
+                await pipe.execute()
+        logger.debug("Invalidated %s cache entry: %s", self.name, key)
+
+    def _clear_local(self) -> None:
+        """Empty the in-process tier"""
+        with self._lock:
+            self.cache.clear()
+            self._expiry.clear()
+            self._expiry_heap.clear()
+
+    async def clear(self) -> None:
+        """Clear all entries from the cache, in every process sharing its Redis"""
+        self._clear_local()
+        if self.redis is not None:
+            keys = [key async for key in self.redis.scan_iter(match=self._redis_key("*"), count=1000)]
+            if keys:
+                await self.redis.unlink(*keys)
+            await self.redis.publish(_INVALIDATION_CHANNEL, orjson.dumps({"cache": self.name, "key": None}))
+        logger.info("Cleared %s cache", self.name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        hits, misses = self._hits.value, self._misses.value
+        total = hits + misses
+        hit_rate = (hits / total) * 100 if total > 0 else 0
+        return {
+            "name": self.name,
+            "entries": len(self.cache),
+            "maxsize": self.maxsize,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": f"{hit_rate:.2f}%"
+        }
+
+
+class SemanticCache(Generic[T]):
+    """
+    Cache keyed by meaning rather than exact text
+
+    Entries are stored next to the L2-normalized embedding of their text. A lookup
+    returns the value of the most similar entry if its cosine similarity reaches
+    the threshold. Per-process and bounded; the oldest entries are dropped first.
+
+    Embeddings are rows of one contiguous float32 matrix, used as a ring buffer,
+    so a lookup scores every entry with a single matrix-vector product.
+    """
+
+    def __init__(self, name: str, embed: Callable[[str], Awaitable[List[float]]],
+                 threshold: float = 0.92, max_entries: int = 1000):
+        """
+        Initialize a new semantic cache
+
+        Args:
+            name: Name of the cache (for logging)
+            embed: Coroutine function returning the embedding of a text
+            threshold: Minimum cosine similarity for a hit
+            max_entries: Maximum number of entries kept
+        """
+        self.name = name
+        self._embed = embed
+        self.threshold = threshold
+        self.max_entries = max_entries
+        # Allocated on the first set(), once the embedding size is known
+        self._vectors: Optional[np.ndarray] = None
+        self._values: List[Optional[T]] = [None] * max_entries
+        self._size = 0
+        # Row the next entry is written to, overwriting the oldest once full
+        self._next = 0
+        self._hits = _Counter()
+        self._misses = _Counter()
+        logger.info("Initialized %s semantic cache with threshold %s", name, threshold)
+
+    async def embed(self, text: str) -> np.ndarray:
+        """
+        Embed a text for get/set
+
+        Returns:
+            The L2-normalized float32 embedding, so dot products are cosine similarities
+        """
+        vector = np.asarray(await self._embed(text), dtype=np.float32)
+        norm = float(np.linalg.norm(vector)) or 1.0
+        return vector / norm
+
+    def get(self, embedding: np.ndarray) -> Optional[T]:
+        """
+        Get the value of the most similar entry
+
+        Args:
+            embedding: Normalized embedding from embed()
+
+        Returns:
+            The cached value or None if nothing is similar enough
+        """
+        best_score, best_value = self.threshold, None
+        if self._size:
+            scores = self._vectors[:self._size] @ embedding
+            best = int(scores.argmax())
+            if scores[best] >= self.threshold:
+                best_score, best_value = float(scores[best]), self._values[best]
+
+        if best_value is not None:
+            self._hits.increment()
+            logger.debug("%s semantic cache HIT (similarity %.3f)", self.name, best_score)
+        else:
+            self._misses.increment()
+            logger.debug("%s semantic cache MISS", self.name)
+        return best_value
+
+    def set(self, embedding: np.ndarray, value: T) -> None:
+        """
+        Add a value to the cache
+
+        Args:
+            embedding: Normalized embedding from embed()
+            value: Value to cache
+        """
+        if self._vectors is None:
+            self._vectors = np.empty((self.max_entries, len(embedding)), dtype=np.float32)
+        self._vectors[self._next] = embedding
+        self._values[self._next] = value
+        self._next = (self._next + 1) % self.max_entries
+        self._size = min(self._size + 1, self.max_entries)
+        logger.debug("Added to %s semantic cache", self.name)
 
     def clear(self) -> None:
         """Clear all entries from the cache"""
-        self.cache.clear()
-        logger.info(f"Cleared {self.name} cache")
+        self._values = [None] * self.max_entries
+        self._size = self._next = 0
+        logger.info("Cleared %s semantic cache", self.name)
 
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
-        total = self.hits + self.misses
-        hit_rate = (self.hits / total) * 100 if total > 0 else 0
+        hits, misses = self._hits.value, self._misses.value
+        total = hits + misses
+        hit_rate = (hits / total) * 100 if total > 0 else 0
         return {
             "name": self.name,
-            "entries": len(self.cache),
-            "hits": self.hits,
-            "misses": self.misses,
+            "entries": self._size,
+            "hits": hits,
+            "misses": misses,
             "hit_rate": f"{hit_rate:.2f}%"
         }
 
 
-# Initialize caches
-transcription_cache = Cache[str, str](name="transcription", ttl_seconds=86400)  # 24 hours TTL
-category_cache = Cache[str, dict](name="category", ttl_seconds=86400)  # 24 hours TTL
+async def get_many(*lookups: Tuple[Cache, Any]) -> List[Optional[Any]]:
+    """
+    Look up keys across several caches in one call
+    In-process hits are served directly; the rest are fetched from Redis with a single MGET.
+
+    Args:
+        lookups: (cache, key) pairs
+
+    Returns:
+        The cached value or None for each pair, in order
+    """
+    values = [cache._get_local(key) for cache, key in lookups]
+
+    remote = [i for i, (cache, _) in enumerate(lookups) if values[i] is None and cache.redis is not None]
+    if remote:
+        # All caches share the one Redis client
+        redis = lookups[remote[0]][0].redis
+        redis_keys = [lookups[i][0]._redis_key(lookups[i][1]) for i in remote]
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.mget(redis_keys)
+            for redis_key in redis_keys:
+                pipe.pttl(redis_key)
+            raws, *pttls = await pipe.execute()
+        for i, raw, pttl in zip(remote, raws, pttls):
+            if raw is not None:
+                cache, key = lookups[i]
+                values[i] = orjson.loads(raw)
+                cache._set_local(key, values[i], _remaining_seconds(pttl))
+
+    for (cache, key), value in zip(lookups, values):
+        cache._record(key, value)
+    return values
+
+
+# Initialize caches, shared through Redis when REDIS_URL is set
+transcription_cache = Cache[str, str](name="transcription", ttl_seconds=86400, redis=get_redis(),
+                                      maxsize=10000)  # 24 hours TTL
+category_cache = Cache[str, dict](name="category", ttl_seconds=86400, redis=get_redis(),
+                                  maxsize=10000)  # 24 hours TTL
 user_preference_cache = Cache[str, Literal["openai", "anthropic"]](name="user_preference",
-                                                                   ttl_seconds=3600)  # 1 hour TTL
\ No newline at end of file
+                                                                   ttl_seconds=3600,
+                                                                   redis=get_redis(),
+                                                                   maxsize=100000)  # 1 hour TTL
+
+_swept_caches = (transcription_cache, category_cache, user_preference_cache)
+_sweeper: Optional[asyncio.Task] = None
+_invalidation_listener: Optional[asyncio.Task] = None
+
+
+async def _sweep_loop(interval_seconds: float) -> None:
+    """Periodically drop expired entries from every cache"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        for cache in _swept_caches:
+            removed = cache.sweep()
+            if removed:
+                logger.debug("Swept %s expired entries from %s cache", removed, cache.name)
+
+
+async def _invalidation_loop(redis) -> None:
+    """Apply invalidations published by any process (this one included) to the in-process tiers"""
+    caches = {cache.name: cache for cache in _swept_caches}
+    while True:
+        try:
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(_INVALIDATION_CHANNEL)
+            try:
+                while True:
+                    message = await pubsub.get_message(timeout=None)
+                    if message is None:
+                        continue
+                    invalidation = orjson.loads(message["data"])
+                    cache = caches.get(invalidation["cache"])
+                    if cache is None:
+                        continue
+                    if invalidation["key"] is None:
+                        cache._clear_local()
+                    else:
+                        cache._remove_local(invalidation["key"])
+            finally:
+                await pubsub.aclose()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Cache invalidation listener failed, resubscribing: %s", e)
+            await asyncio.sleep(1)
+
+
+def start_cache_sweeper() -> None:
+    """
+    Start the expired-entry sweeper on the running event loop
+    With Redis, also start listening for invalidations made by other processes.
+    """
+    global _sweeper, _invalidation_listener
+    if _sweeper is None:
+        _sweeper = asyncio.create_task(_sweep_loop(settings.CACHE_SWEEP_INTERVAL_SECONDS))
+    redis = get_redis()
+    if _invalidation_listener is None and redis is not None:
+        _invalidation_listener = asyncio.create_task(_invalidation_loop(redis))
+
+
+async def stop_cache_sweeper() -> None:
+    """Stop the sweeper and invalidation listener if they're running"""
+    global _sweeper, _invalidation_listener
+    for task in (_sweeper, _invalidation_listener):
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    _sweeper = _invalidation_listener = None
@@ -1,36 +1,95 @@
 # categorization.py
-import json
-from typing import Dict, Any, Literal, Optional
+import asyncio
+from functools import lru_cache
+from typing import Dict, Any, List, Literal, Optional, Tuple, TYPE_CHECKING, get_args
 
+import orjson
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
-from langchain_anthropic import ChatAnthropic
-from langchain_openai import ChatOpenAI
 
+from src.cache import SemanticCache
 from src.config import settings
-from src.schemas import TranscriptCategory
+from src.logging import get_logger
+from src.schemas import (
+    PRIMARY_TOPIC_DESCRIPTION,
+    SENTIMENT_DESCRIPTION,
+    SUMMARY_DESCRIPTION,
+    Sentiment,
+    TranscriptCategory
+)
+
+if TYPE_CHECKING:
+    from langchain_openai import OpenAIEmbeddings
+
+logger = get_logger(__name__)
 
 
 class CategoryTool(BaseModel):
     """Tool schema for categorizing a transcript"""
-    primary_topic: str = Field(..., description="The primary topic discussed in the transcript")
-    sentiment: Literal["positive", "neutral", "negative"] = Field(
-        ...,
-        description="The overall sentiment of the transcript"
-    )
+    primary_topic: str = Field(..., description=PRIMARY_TOPIC_DESCRIPTION)
+    sentiment: Sentiment = Field(..., description=SENTIMENT_DESCRIPTION)
     keywords: str = Field(
         ...,
         description="3-5 keywords that represent the main topics in the transcript, comma separated"
     )
     confidence: float = Field(..., description="Confidence score for the categorization (0.0 to 1.0)")
-    summary: str = Field(..., description="A short summary of the transcript content (1-2 sentences)")
+    summary: str = Field(..., description=SUMMARY_DESCRIPTION)
 
 
+class CategoryBatchTool(BaseModel):
+    """Tool schema for categorizing several transcripts in one request"""
+    categories: List[CategoryTool] = Field(
+        ...,
+        description="One categorization per transcript, in the same order as the transcripts were given"
+    )
+
+
+# Prompt templates are parsed once here rather than on every categorization
+_CATEGORIZE_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", """You are an expert transcript analyzer. Your job is to categorize transcripts based on content.
+
+You MUST respond using ONLY valid JSON format that matches the CategoryTool schema.
+Your response should have these fields:
+- primary_topic: The main topic of the transcript
+- sentiment: Must be one of ["positive", "neutral", "negative"]
+- keywords: 3-5 comma-separated keywords from the transcript
+- summary: A 1-2 sentence summary of the transcript
+
+DO NOT include any explanations, just return the JSON.
+"""),
+        ("human", "Please categorize this transcript: {transcript}")
+    ])
+
+_CATEGORIZE_BATCH_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", """You are an expert transcript analyzer. Your job is to categorize transcripts based on content.
+
+You will be given several numbered transcripts. Categorize each one independently.
+You MUST respond using ONLY valid JSON format that matches the CategoryBatchTool schema,
+with exactly one entry in "categories" per transcript, in the same order.
+Each entry should have these fields:
+- primary_topic: The main topic of the transcript
+- sentiment: Must be one of ["positive", "neutral", "negative"]
+- keywords: 3-5 comma-separated keywords from the transcript
+- summary: A 1-2 sentence summary of the transcript
+
+DO NOT include any explanations, just return the JSON.
+"""),
+        ("human", "Please categorize these transcripts:\n\n{transcripts}")
+    ])
+
+
+# One client per provider, reused across requests so HTTP connections are pooled
+@lru_cache(maxsize=2)
 def get_llm_client(provider: Literal["openai", "anthropic"]) -> Any:
     """Get the appropriate LLM client based on provider"""
+    # Provider SDKs are imported on first use; together they take most of a second to import
     if provider == "openai":
         if not settings.OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY not set in environment")
+        from langchain_openai import ChatOpenAI
+
         return ChatOpenAI(
             api_key=settings.OPENAI_API_KEY,
             model=settings.OPENAI_MODEL_ID,
@@ -38,6 +97,8 @@ def get_llm_client(provider: Literal["openai", "anthropic"]) -> Any:
     elif provider == "anthropic":
         if not settings.ANTHROPIC_API_KEY:
             raise ValueError("ANTHROPIC_API_KEY not set in environment")
+        from langchain_anthropic import ChatAnthropic
+
         return ChatAnthropic(
             api_key=settings.ANTHROPIC_API_KEY,
             model_name=settings.ANTHROPIC_MODEL_ID,
@@ -46,59 +107,194 @@ def get_llm_client(provider: Literal["openai", "anthropic"]) -> Any:
         raise ValueError(f"Unknown provider: {provider}")
 
 
-def categorize_transcript(transcript: str, provider: Literal["openai", "anthropic"]) -> Optional[TranscriptCategory]:
+# Prompt | structured-output chains, built once per provider and schema since binding
+# the schema generates its JSON schema and tool definition
+_chains: Dict[Tuple[str, type], Any] = {}
+
+
+def _get_chain(provider: Literal["openai", "anthropic"], schema: type) -> Any:
+    """Get the categorization chain for a provider and output schema, building it on first use"""
+    chain = _chains.get((provider, schema))
+    if chain is None:
+        prompt = _CATEGORIZE_BATCH_PROMPT if schema is CategoryBatchTool else _CATEGORIZE_PROMPT
+        chain = _chains[provider, schema] = prompt | get_llm_client(provider).with_structured_output(schema)
+    return chain
+
+
+@lru_cache(maxsize=1)
+def get_embedding_client() -> "OpenAIEmbeddings":
+    """Get the client used to embed transcripts for the semantic cache"""
+    if not settings.OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY not set in environment")
+    from langchain_openai import OpenAIEmbeddings
+
+    return OpenAIEmbeddings(
+        api_key=settings.OPENAI_API_KEY,
+        model=settings.EMBEDDING_MODEL_ID,
+        dimensions=settings.EMBEDDING_DIMENSIONS,
+    )
+
+
+async def categorize_transcript(
+        transcript: str,
+        provider: Literal["openai", "anthropic"]
+) -> Optional[TranscriptCategory]:
     """
     Categorize a transcript using the specified LLM provider
     Returns a TranscriptCategory object or None if categorization failed
     """
     try:
-        # Get the appropriate LLM client
-        llm = get_llm_client(provider)
-        llm_structured_output = llm.with_structured_output(CategoryTool)
+        # Execute the chain without blocking the event loop
+        result = await _get_chain(provider, CategoryTool).ainvoke({"transcript": transcript})
 
+        return _to_transcript_category(result)
 
-        # Create a structured prompt for categorization
-        prompt = ChatPromptTemplate.from_messages(
-            [
-                ("system", """You are an expert transcript analyzer. Your job is to categorize transcripts based on content.
+    except Exception as e:
+        logger.error("Error categorizing transcript: %s", e)
+        # Return None to indicate failure
+        return None
 
-You MUST respond using ONLY valid JSON format that matches the CategoryTool schema.
-Your response should have these fields:
-- primary_topic: The main topic of the transcript
-- sentiment: Must be one of ["positive", "neutral", "negative"]
-- keywords: 3-5 comma-separated keywords from the transcript
-- summary: A 1-2 sentence summary of the transcript
 
-DO NOT include any explanations, just return the JSON.
-"""),
-                ("human", "Please categorize this transcript: {transcript}")
-            ])
+async def categorize_transcript_batch(
+        transcripts: List[str],
+        provider: Literal["openai", "anthropic"]
+) -> List[Optional[TranscriptCategory]]:
+    """
+    Categorize several transcripts with a single LLM request
+    Returns one TranscriptCategory (or None on failure) per transcript, in input order
+    """
+    if len(transcripts) == 1:
+        return [await categorize_transcript(transcripts[0], provider)]
+
+    try:
+        numbered = "\n\n".join(
+            f"Transcript {index}:\n{transcript}" for index, transcript in enumerate(transcripts, start=1)
+        )
+        result = await _get_chain(provider, CategoryBatchTool).ainvoke({"transcripts": numbered})
+    except Exception as e:
+        # Retrying each transcript would only repeat a failed request len(transcripts) times
+        logger.error("Error categorizing transcript batch: %s", e)
+        return [None] * len(transcripts)
+
+    if len(result.categories) != len(transcripts):
+        # Categories can't be matched back to transcripts, so ask for each one separately
+        logger.warning("Expected %s categories, got %s; falling back to single requests",
+                       len(transcripts), len(result.categories))
+        return list(await asyncio.gather(
+            *(categorize_transcript(transcript, provider) for transcript in transcripts)
+        ))
+
+    return [_to_transcript_category(item) for item in result.categories]
+
+
+def _to_transcript_category(result: CategoryTool) -> TranscriptCategory:
+    """Convert the LLM tool output to our TranscriptCategory schema"""
+    try:
+        keywords = result.keywords.split(",")
+    except Exception:
+        keywords = []
 
-        # Create the chain
-        chain = prompt | llm_structured_output
+    return TranscriptCategory(
+        primary_topic=result.primary_topic,
+        sentiment=result.sentiment,
+        keywords=keywords,
+        summary=result.summary
+    )
+
+
+class CategorizationBatcher:
+    """
+    Micro-batches categorization requests for one provider
+
+    Requests that arrive within max_wait_ms of each other (up to max_batch_size)
+    are sent to the LLM as a single prompt.
+    """
+
+    def __init__(
+            self,
+            provider: Literal["openai", "anthropic"],
+            semaphore: asyncio.Semaphore,
+            max_batch_size: int = settings.CATEGORIZATION_BATCH_MAX_SIZE,
+            max_wait_ms: int = settings.CATEGORIZATION_BATCH_MAX_WAIT_MS
+    ):
+        self.provider = provider
+        self.semaphore = semaphore
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
+        self._dispatches = set()
+
+    async def submit(self, transcript: str) -> Optional[TranscriptCategory]:
+        """Queue a transcript for the next batch and wait for its category"""
+        # The consumer is started lazily so it binds to the running event loop
+        if self._consumer is None or self._consumer.done():
+            self._queue = asyncio.Queue()
+            self._consumer = asyncio.create_task(self._collect_batches())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((transcript, future))
+        return await future
+
+    async def _collect_batches(self) -> None:
+        """Group queued requests into batches and dispatch them"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait_seconds
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
 
-        # Execute the chain
-        result = chain.invoke({"transcript": transcript})
+            # Dispatch in the background so the next batch can fill while this one is in flight
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
 
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Send one batch to the LLM and resolve each request's future"""
+        transcripts = [transcript for transcript, _ in batch]
         try:
-            keywords = result.keywords.split(",")
-        except Exception:
-            keywords = []
-
-        # Convert to our TranscriptCategory schema
-        category = TranscriptCategory(
-            primary_topic=result.primary_topic,
-            sentiment=result.sentiment,
-            keywords=keywords,
-            summary=result.summary
-        )
+            async with self.semaphore:
+                results = await categorize_transcript_batch(transcripts, self.provider)
+        except Exception as e:
+            logger.error("Error dispatching categorization batch: %s", e)
+            results = [None] * len(batch)
 
-        return category
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
 
-    except Exception as e:
-        print(f"Error categorizing transcript: {e}")
-        # Return None to indicate failure
-        return None
+
+# Caps the number of LLM categorization requests in flight at once
+categorization_semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_CATEGORIZATIONS)
+
+# One batcher per provider so each batched prompt goes to a single model
+categorization_batchers: Dict[str, CategorizationBatcher] = {
+    provider: CategorizationBatcher(provider, categorization_semaphore)
+    for provider in ("openai", "anthropic")
+}
+
+# Reuses categories for transcripts that say the same thing in different words
+# Disabled without an OpenAI key, since that's what produces the embeddings
+semantic_category_cache: Optional[SemanticCache[dict]] = (
+    SemanticCache[dict](
+        name="semantic_category",
+        # Resolved per call so the client (and its SDK import) is only created once something is embedded
+        embed=lambda text: get_embedding_client().aembed_query(text),
+        threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+        max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES
+    )
+    if settings.OPENAI_API_KEY else None
+)
+
+
+_SENTIMENTS = frozenset(get_args(Sentiment))
 
 
 def validate_json_response(response: str) -> Dict[str, Any]:
@@ -108,7 +304,7 @@ def validate_json_response(response: str) -> Dict[str, Any]:
     """
     try:
         # Try to parse the response as JSON
-        parsed = json.loads(response)
+        parsed = orjson.loads(response)
 
         # Check that it has the expected fields
         required_fields = ["primary_topic", "sentiment", "keywords", "confidence", "summary"]
@@ -117,7 +313,7 @@ def validate_json_response(response: str) -> Dict[str, Any]:
                 raise ValueError(f"Missing required field: {field}")
 
         # Validate sentiment value
-        if parsed["sentiment"] not in ["positive", "neutral", "negative"]:
+        if parsed["sentiment"] not in _SENTIMENTS:
             raise ValueError(f"Invalid sentiment value: {parsed['sentiment']}")
 
         # Validate confidence value
@@ -126,5 +322,5 @@ def validate_json_response(response: str) -> Dict[str, Any]:
 
         return parsed
 
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         raise ValueError("Response is not valid JSON")
@@ -14,8 +14,47 @@ class Settings(BaseSettings):
     API_VERSION: str = "1.0.0"
     LOG_LEVEL: str = "INFO"
 
+    # Job processing
+    MAX_CONCURRENT_CATEGORIZATIONS: int = 8
+    # Categorization requests arriving within the wait window are sent as one LLM request
+    CATEGORIZATION_BATCH_MAX_SIZE: int = 32
+    CATEGORIZATION_BATCH_MAX_WAIT_MS: int = 50
+    # Jobs are I/O bound, so the pool is sized by in-flight jobs rather than CPU count
+    WORKER_CONCURRENCY: int = 16
+    # Set to False to make this process enqueue-only and run `python -m src.worker` separately (needs REDIS_URL)
+    RUN_WORKERS: bool = True
+    # Processes for the speech-to-text stage; defaults to the CPU count
+    TRANSCRIPTION_PROCESSES: Optional[int] = None
+    # Threads for blocking I/O run off the event loop (upload spooling); bounded so bursts can't spawn more
+    IO_THREADS: int = 8
+    # Where uploaded audio is spooled for the workers; must be shared storage if they run on other hosts
+    UPLOAD_DIR: Optional[str] = None
+    # Jobs waiting beyond this are rejected with 429 instead of piling up
+    JOB_QUEUE_MAX_SIZE: int = 1000
+
+    # Semantic category cache: reuse categories for near-duplicate transcripts (needs OPENAI_API_KEY for embeddings)
+    # Each job without an exact-match category makes one paid embedding request (a network round trip) first
+    EMBEDDING_MODEL_ID: str = "text-embedding-3-small"
+    # Shortened text-embedding-3 vectors: smaller to transfer and to keep in the similarity matrix
+    EMBEDDING_DIMENSIONS: int = 256
+    SEMANTIC_CACHE_THRESHOLD: float = 0.92
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1000
+
+    # How often expired in-process cache entries are removed
+    CACHE_SWEEP_INTERVAL_SECONDS: int = 60
+
+    # Storage - leave REDIS_URL unset to keep jobs and users in process memory
+    REDIS_URL: Optional[str] = None
+    # Jobs are dropped this long after creation, by either store
+    JOB_TTL_SECONDS: int = 86400
+    # In-memory store only; least recently used jobs are evicted past this
+    MAX_STORED_JOBS: int = 10000
+
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 
 # Create a global settings instance
-settings = Settings()
\ No newline at end of file
+settings = Settings()
+
+# Read on every request, so hot paths import the value itself rather than looking it up on settings
+API_VERSION = settings.API_VERSION
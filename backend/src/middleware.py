@@ -0,0 +1,142 @@
+# src/middleware.py
+"""Pure ASGI middleware for the per-request hot path"""
+from functools import lru_cache
+from typing import List, Tuple
+
+import orjson
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.logging import get_logger
+
+logger = get_logger(__name__)
+
+_ALLOWED_METHODS = b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"
+
+
+class AllowAllCORSMiddleware:
+    """
+    CORS for an allow-all-origins policy, without Starlette's CORSMiddleware stack
+
+    Preflight requests are answered directly and never reach the router.
+    Other cross-origin responses get the CORS headers appended as they go out.
+    """
+
+    def __init__(self, app: ASGIApp, max_age: int = 600, expose_headers: Tuple[str, ...] = ("X-API-Version",)):
+        self.app = app
+        self.max_age = str(max_age).encode()
+        self.expose_headers = ", ".join(expose_headers).encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = None
+        requested_method = None
+        requested_headers = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                requested_method = value
+            elif name == b"access-control-request-headers":
+                requested_headers = value
+
+        # Not a cross-origin request, nothing to add
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        # The origin is echoed back rather than "*" because credentials are allowed
+        cors_headers: List[Tuple[bytes, bytes]] = [
+            (b"access-control-allow-origin", origin),
+            (b"access-control-allow-credentials", b"true"),
+            (b"vary", b"Origin"),
+        ]
+
+        if scope["method"] == "OPTIONS" and requested_method is not None:
+            cors_headers.append((b"access-control-allow-methods", _ALLOWED_METHODS))
+            cors_headers.append((b"access-control-max-age", self.max_age))
+            if requested_headers is not None:
+                cors_headers.append((b"access-control-allow-headers", requested_headers))
+            await send({"type": "http.response.start", "status": 204, "headers": cors_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        cors_headers.append((b"access-control-expose-headers", self.expose_headers))
+
+        async def send_with_cors(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + cors_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+
+@lru_cache(maxsize=32)
+def _mismatch_body(client_version: str, server_version: str) -> Tuple[bytes, bytes]:
+    """
+    Render the 426 body (shaped like ErrorResponse) once per distinct client version
+
+    Returns:
+        The JSON body and its content-length header value
+    """
+    body = orjson.dumps({
+        "version": server_version,
+        "detail": (f"Version mismatch: Client version {client_version} does not match server version "
+                   f"{server_version}. Please refresh your application.")
+    })
+    return body, str(len(body)).encode()
+
+
+class VersionMiddleware:
+    """
+    Checks the client's X-API-Version and sends the server's back, for requests under the given paths
+
+    A request carrying a different version is answered with a 426 and never
+    reaches the router. Requests without the header are let through.
+    """
+
+    def __init__(self, app: ASGIApp, version: str, paths: Tuple[str, ...]):
+        self.app = app
+        self.version = version
+        self.paths = paths
+        self.version_bytes = version.encode("latin-1")
+        self.version_header = (b"x-api-version", self.version_bytes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        # The raw header is compared with the pre-encoded version: a short memcmp, cheaper than
+        # a cache lookup in front of it would be, and nothing is decoded unless it mismatches
+        for name, value in scope["headers"]:
+            if name == b"x-api-version":
+                if value and value != self.version_bytes:
+                    await self._reject(value.decode("latin-1"), send)
+                    return
+                break
+
+        async def send_with_version(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [self.version_header]
+            await send(message)
+
+        await self.app(scope, receive, send_with_version)
+
+    async def _reject(self, client_version: str, send: Send) -> None:
+        """Answer with 426 Upgrade Required"""
+        logger.warning("Version mismatch: Client version %s does not match server version %s",
+                       client_version, self.version)
+        body, content_length = _mismatch_body(client_version, self.version)
+        await send({
+            "type": "http.response.start",
+            "status": 426,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", content_length),
+                self.version_header,
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
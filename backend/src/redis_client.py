@@ -0,0 +1,41 @@
+# src/redis_client.py
+"""Shared Redis connection, only used when REDIS_URL is configured"""
+from typing import Optional, TYPE_CHECKING
+
+from src.config import settings
+from src.logging import get_logger
+
+if TYPE_CHECKING:
+    from redis.asyncio import Redis
+
+logger = get_logger(__name__)
+
+_client: Optional["Redis"] = None
+
+
+def get_redis() -> Optional["Redis"]:
+    """
+    Get the shared async Redis client
+
+    Returns:
+        The client, or None when REDIS_URL is not set and in-memory storage should be used
+    """
+    global _client
+    if not settings.REDIS_URL:
+        return None
+
+    if _client is None:
+        # Imported lazily so the in-memory setup doesn't need redis installed
+        from redis.asyncio import Redis
+
+        _client = Redis.from_url(settings.REDIS_URL)
+        logger.info("Created Redis client for job and user storage")
+    return _client
+
+
+async def close_redis() -> None:
+    """Close the shared Redis client if one was created"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -4,8 +4,9 @@ from typing import Dict
 from fastapi import APIRouter
 
 from src.cache import transcription_cache, category_cache, user_preference_cache
+from src.categorization import semantic_category_cache
 from src.logging import get_logger
-from src.state import active_jobs, user_store
+from src.state import job_store
 
 logger = get_logger(__name__)
 router = APIRouter()
@@ -18,17 +19,21 @@ async def get_cache_stats():
         "transcription_cache": transcription_cache.get_stats(),
         "category_cache": category_cache.get_stats(),
         "user_preference_cache": user_preference_cache.get_stats(),
-        "active_jobs": len(active_jobs),
-        "users": len(user_store)
+        "semantic_category_cache": semantic_category_cache.get_stats() if semantic_category_cache else None,
+        "active_jobs": await job_store.count_jobs(),
+        "jobs_by_status": await job_store.count_jobs_by_status(),
+        "users": await job_store.count_users()
     }
 
 @router.post("/clear-cache", response_model=Dict)
 async def clear_cache():
     """Clear all caches"""
     logger.info("Clearing all caches")
-    transcription_cache.clear()
-    category_cache.clear()
-    user_preference_cache.clear()
+    await transcription_cache.clear()
+    await category_cache.clear()
+    await user_preference_cache.clear()
+    if semantic_category_cache is not None:
+        semantic_category_cache.clear()
 
     return {
         "status": "success",
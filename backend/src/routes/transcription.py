@@ -1,286 +1,186 @@
 # src/routes/transcription.py
-from typing import Optional, List
+from typing import AsyncIterator, List, Optional
 from datetime import datetime
+import asyncio
 import uuid
-import threading
-import random
-import hashlib
-import time
 
-from fastapi import APIRouter, Header, Request, Response, Depends, HTTPException
+import orjson
+
+from fastapi import APIRouter, Request, Response, Depends, HTTPException, File, UploadFile
+from fastapi.responses import StreamingResponse
 
 from src.schemas import (
     TranscriptionJobResponse,
     TranscriptionStatusResponse,
-    TranscriptCategory
+    VERSION_FRAGMENT
 )
 from src.logging import get_logger
-from src.config import settings
-from src.categorization import categorize_transcript
-from src.cache import transcription_cache, category_cache, user_preference_cache
-from src.routes.user import get_or_create_user
-from src.utils import verify_version
-from src.state import active_jobs, user_store
+from src.config import settings, API_VERSION
+from src.routes.user import get_current_user
+from src.utils import content_hash, mock_rng, spool_and_hash
+from src.state import job_store, JobState
+from src.worker import enqueue_job, remove_audio, update_job_status, JobQueueFullError
 
 logger = get_logger(__name__)
 router = APIRouter()
 
-def process_transcription(job_id: str, audio_data: bytes):
-    """Mock function to simulate async transcription processing. Returns a random transcription."""
-    # Check cache first based on audio data hash
-    audio_hash = hashlib.md5(audio_data).hexdigest()
-    cached_transcription = transcription_cache.get(audio_hash)
-
-    if cached_transcription:
-        logger.info(f"Using cached transcription for job {job_id}")
-        return cached_transcription
-
-    # Simulate processing delay
-    time.sleep(random.randint(2, 5))
-
-    # Generate random transcription
-    transcription = random.choice([
-        "I've always been fascinated by cars, especially classic muscle cars from the 60s and 70s. The raw power and beautiful design of those vehicles is just incredible.",
-        "Bald eagles are such majestic creatures. I love watching them soar through the sky and dive down to catch fish. Their white heads against the blue sky is a sight I'll never forget.",
-        "Deep sea diving opens up a whole new world of exploration. The mysterious creatures and stunning coral reefs you encounter at those depths are unlike anything else on Earth."
-    ])
-
-    # Cache the result
-    transcription_cache.set(audio_hash, transcription)
-
-    return transcription
-
-
-def get_user_model_from_db(user_id: str) -> str:
-    """
-    Mocks a slow and expensive function to simulate fetching a user's preferred LLM model from database
-    Returns either 'openai' or 'anthropic' after a random delay.
-    Now with caching!
-    """
-    # Check if we have this user's preference cached
-    cached_preference = user_preference_cache.get(user_id)
-    if cached_preference:
-        logger.info(f"Using cached LLM preference for user {user_id}: {cached_preference}")
-        return cached_preference
-
-    # Simulate slow database query
-    logger.info(f"Expensive database query for user {user_id} LLM preference")
-    time.sleep(random.randint(5, 8))  # Simulate slow DB query
-
-    # Get random preference
-    preference = random.choice(["openai", "anthropic"])
-
-    # Cache the result
-    user_preference_cache.set(user_id, preference)
-
-    logger.info(f"User {user_id} LLM preference set to {preference}")
-    return preference
-
-
-def process_transcription_job(job_id: str, user_id: str, audio_data: bytes = b"mock_audio"):
-    """
-    Process a transcription job in a separate thread
-    Updates job status at various points
-    """
-    try:
-        # Update job to processing status
-        active_jobs[job_id]["status"] = "processing"
-        active_jobs[job_id]["progress"] = 0.1
-
-        # Simulate initial processing delay
-        time.sleep(random.uniform(0.5, 1))
-        active_jobs[job_id]["progress"] = 0.3
-
-        # Get transcription (now with caching)
-        transcription = process_transcription(job_id, audio_data)
-
-        # Update job with transcription
-        active_jobs[job_id]["transcription"] = transcription
-        active_jobs[job_id]["progress"] = 0.5
-
-        # Generate hash for the transcription to use as category cache key
-        transcription_hash = hashlib.md5(transcription.encode()).hexdigest()
-
-        # Check if we have a cached categorization for this transcription
-        cached_category = category_cache.get(transcription_hash)
-
-        if cached_category:
-            logger.info(f"Using cached categorization for job {job_id}")
-            active_jobs[job_id]["category"] = cached_category
-            active_jobs[job_id]["progress"] = 0.9
-        else:
-            # Get the user's preferred LLM model (now with caching)
-            logger.info(f"Getting LLM preference for user {user_id}")
-            llm_provider = get_user_model_from_db(user_id)
-            logger.info(f"User {user_id} prefers {llm_provider}")
-
-            active_jobs[job_id]["progress"] = 0.7
-
-            # Categorize the transcription using the appropriate LLM
-            logger.info(f"Categorizing transcription for job {job_id} using {llm_provider}")
-            try:
-                category = categorize_transcript(transcription, llm_provider)
-                if category:
-                    category_dict = category.model_dump()
-                    active_jobs[job_id]["category"] = category_dict
-
-                    # Cache the categorization result
-                    category_cache.set(transcription_hash, category_dict)
-
-                    logger.info(f"Categorization successful for job {job_id}: {category.primary_topic}")
-                else:
-                    logger.warning(f"Categorization failed for job {job_id}")
-            except Exception as e:
-                logger.error(f"Error during categorization for job {job_id}: {e}")
-
-            active_jobs[job_id]["progress"] = 0.9
-
-        time.sleep(random.uniform(0.5, 1))
+_FINAL_STATUSES = ("completed", "error")
 
-        # Update job with finished status
-        active_jobs[job_id]["status"] = "completed"
-        active_jobs[job_id]["progress"] = 1.0
+# Hashes of the mock audio seeds used when no file is sent; there are only ten, so hash them once
+_MOCK_AUDIO_HASHES = tuple(content_hash(str(seed).encode()) for seed in range(1, 11))
 
-        # Log job completion with user ID
-        logger.info(f"Job {job_id} completed for user {user_id}")
-    except Exception as e:
-        # Update job with error status
-        active_jobs[job_id]["status"] = "error"
-        active_jobs[job_id]["error"] = str(e)
+# Idle streams get a comment line this often so proxies don't drop the connection
+_STREAM_KEEPALIVE_SECONDS = 15
 
-        # Log error with user ID
-        logger.error(f"Error processing job {job_id} for user {user_id}: {str(e)}")
-
-@router.post("/transcribe", response_model=TranscriptionJobResponse, dependencies=[Depends(verify_version)])
+@router.post("/transcribe", response_model=TranscriptionJobResponse)
 async def start_transcription(
         request: Request,
         response: Response,
-        x_user_id: Optional[str] = Header(None)
+        audio: Optional[UploadFile] = File(None),
+        user_id: str = Depends(get_current_user)
 ):
     """
     Start a transcription job and return a job ID immediately
     """
-    # Ensure we have a valid user ID
-    user_id = get_or_create_user(x_user_id)
-
     # Generate a job ID
     job_id = str(uuid.uuid4())
 
-    # Read request body for hashing (in real app, we'd extract the audio file)
-    # For demo purposes, we're using a random seed as mock audio data
-    mock_audio_data = str(random.randint(1, 10)).encode()  # Use random seed for demo
-
-    # Create job entry with initial status
-    active_jobs[job_id] = {
-        "user_id": user_id,
-        "status": "queued",
-        "progress": 0.0,
-        "created_at": datetime.now().isoformat(),
-        "transcription": None,
-        "category": None,
-        "error": None
-    }
-
-    # Add job to user's job list
-    if user_id in user_store:
-        user_store[user_id]["jobs"].append(job_id)
-
-    # Start a background thread to process the job
-    thread = threading.Thread(
-        target=process_transcription_job,
-        args=(job_id, user_id, mock_audio_data)
-    )
-    thread.daemon = True
-    thread.start()
+    if audio is not None:
+        # Hash the upload while copying it to a file for the workers, a chunk at a time off the event loop
+        audio_hash, audio_path = await asyncio.to_thread(spool_and_hash, audio.file, settings.UPLOAD_DIR)
+    else:
+        # No file sent: use a random seed as mock audio data for the demo
+        audio_hash, audio_path = mock_rng.choice(_MOCK_AUDIO_HASHES), None
+
+    try:
+        # Create job entry with initial status and add it to the user's job list
+        job = JobState(
+            user_id=user_id,
+            status="queued",
+            progress=0.0,
+            created_at=datetime.now().isoformat()
+        )
+        job.response_json = TranscriptionStatusResponse.render_job(job_id, job, API_VERSION)
+        await job_store.create_job(job_id, job)
+
+        # Hand the job to the worker pool; the response doesn't wait for it
+        try:
+            await enqueue_job(job_id, user_id, audio_hash, audio_path)
+        except JobQueueFullError as e:
+            logger.warning("Rejected job %s for user %s: %s", job_id, user_id, e)
+            await update_job_status(job_id, status="error", error="Server is busy, please try again shortly")
+            raise HTTPException(status_code=429, detail="Too many transcription jobs in progress. Please try again shortly.")
+    except BaseException:
+        # Until the job is queued no worker owns the audio, so nothing else would delete it
+        remove_audio(audio_path)
+        raise
 
     # Log job creation
-    logger.info(f"Job {job_id} created for user {user_id}")
+    logger.info("Job %s created for user %s", job_id, user_id)
 
-    # Return job ID and initial status
-    return TranscriptionJobResponse(job_id=job_id, status="queued", version=settings.API_VERSION)
+    # Return job ID and initial status, assembled as a TranscriptionJobResponse (job IDs are UUIDs, nothing to escape)
+    return Response(
+        content=b"{" + VERSION_FRAGMENT + b',"job_id":"' + job_id.encode() + b'","status":"queued"}',
+        media_type="application/json"
+    )
 
 
-@router.get("/jobs/{job_id}", response_model=TranscriptionStatusResponse, dependencies=[Depends(verify_version)])
+@router.get("/jobs/{job_id}", response_model=TranscriptionStatusResponse)
 async def get_job_status(
         job_id: str,
         response: Response,
-        x_user_id: Optional[str] = Header(None)
+        user_id: str = Depends(get_current_user)
 ):
     """
     Get the status of a transcription job
     """
-    # Ensure we have a valid user ID
-    user_id = get_or_create_user(x_user_id)
+    # The response is rendered whenever the job changes, so polling only needs that one field
+    response_json = await job_store.get_job_response(job_id)
+    if response_json is not None:
+        logger.info("Job %s status checked by user %s", job_id, user_id)
+        return Response(content=response_json, media_type="application/json")
+
+    # Otherwise the job is missing, or was stored before responses were pre-rendered
+    job = await job_store.get_job(job_id)
 
     # Check if job exists
-    if job_id not in active_jobs:
-        logger.warning(f"Job {job_id} not found for user {user_id}")
+    if job is None:
+        logger.warning("Job %s not found for user %s", job_id, user_id)
         raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
 
-    # Get job details
-    job = active_jobs[job_id]
-
-    # Convert category dict to TranscriptCategory model if it exists
-    category = None
-    if job.get("category"):
-        category = TranscriptCategory(**job["category"])
-
     # Log job status check
-    logger.info(f"Job {job_id} status checked by user {user_id}")
-
-    # Return job status
-    return TranscriptionStatusResponse(
-        job_id=job_id,
-        status=job["status"],
-        progress=job["progress"],
-        transcription=job.get("transcription"),
-        category=category,
-        error=job.get("error"),
-        version=settings.API_VERSION
-    )
+    logger.info("Job %s status checked by user %s", job_id, user_id)
 
+    # Return job status, rendered to JSON in one step rather than via a dict
+    response_json = TranscriptionStatusResponse.render_job(job_id, job, API_VERSION)
+    return Response(content=response_json, media_type="application/json")
 
-@router.get("/jobs", response_model=List[TranscriptionStatusResponse], dependencies=[Depends(verify_version)])
+
+@router.get("/jobs", response_model=List[TranscriptionStatusResponse])
 async def get_user_jobs(
         response: Response,
-        x_user_id: Optional[str] = Header(None)
+        user_id: str = Depends(get_current_user)
 ):
     """
     Get all jobs for a user
     """
-    # Ensure we have a valid user ID
-    user_id = get_or_create_user(x_user_id)
-
-    # Check if user exists and has jobs
-    if user_id not in user_store:
-        logger.info(f"No jobs found for user {user_id}")
+    # Get the user's jobs with their details in one store call, skipping expired ones
+    user_jobs = await job_store.get_user_jobs(user_id)
+    if not user_jobs:
+        logger.info("No jobs found for user %s", user_id)
         return []
 
-    # Get user's job IDs
-    job_ids = user_store[user_id].get("jobs", [])
-
-    # Get job details for each job ID
-    jobs = []
-    for job_id in job_ids:
-        if job_id in active_jobs:
-            job = active_jobs[job_id]
-
-            # Convert category dict to TranscriptCategory model if it exists
-            category = None
-            if job.get("category"):
-                category = TranscriptCategory(**job["category"])
-
-            jobs.append(TranscriptionStatusResponse(
-                job_id=job_id,
-                status=job["status"],
-                progress=job["progress"],
-                transcription=job.get("transcription"),
-                category=category,
-                error=job.get("error"),
-                version=settings.API_VERSION
-            ))
+    # Jobs carry their pre-rendered response, so this is a join rather than N serializations
+    jobs = [
+        job.response_json or TranscriptionStatusResponse.render_job(job_id, job, API_VERSION)
+        for job_id, job in user_jobs
+    ]
 
     # Log jobs list request
-    logger.info(f"Jobs list requested by user {user_id}, found {len(jobs)} jobs")
+    logger.info("Jobs list requested by user %s, found %s jobs", user_id, len(jobs))
+
+    return Response(content=b"[" + b",".join(jobs) + b"]", media_type="application/json")
+
+
+async def _job_status_events(job_id: str) -> AsyncIterator[str]:
+    """Yield a job's status as server-sent events until the job finishes"""
+    # Subscribe before reading the snapshot so no update falls in between
+    async with job_store.subscribe(job_id) as updates:
+        job = await job_store.get_job(job_id)
+        if job is None:
+            return
+
+        snapshot = job.response_json or TranscriptionStatusResponse.render_job(job_id, job, API_VERSION)
+        yield f"data: {snapshot.decode()}\n\n"
+        if job.status in _FINAL_STATUSES:
+            return
+
+        while True:
+            try:
+                update = await asyncio.wait_for(updates.get(), timeout=_STREAM_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+
+            yield f"data: {orjson.dumps(update).decode()}\n\n"
+            if update.get("status") in _FINAL_STATUSES:
+                return
+
+
+@router.get("/jobs/{job_id}/stream")
+async def stream_job_status(job_id: str):
+    """
+    Stream status updates for a transcription job as server-sent events
+    The first event is the full job status; later events carry only the fields that changed.
+    The stream closes once the job completes or fails.
+    """
+    if await job_store.get_job(job_id) is None:
+        logger.warning("Job %s not found for status stream", job_id)
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
 
-    return jobs
\ No newline at end of file
+    logger.info("Status stream opened for job %s", job_id)
+    return StreamingResponse(
+        _job_status_events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
\ No newline at end of file
@@ -1,46 +1,56 @@
 # src/routes/user.py
 from typing import Optional
-from datetime import datetime
+from functools import lru_cache
+import time
 import uuid
 
-from fastapi import APIRouter, Header
+import orjson
+from fastapi import APIRouter, Depends, Header, Response
 
-from src.schemas import UserResponse
+from src.schemas import UserResponse, VERSION_FRAGMENT
 from src.logging import get_logger
-from src.config import settings
-from src.state import user_store
+from src.state import job_store
 
 logger = get_logger(__name__)
 router = APIRouter()
 
-def get_or_create_user(user_id: Optional[str] = None) -> str:
+async def get_or_create_user(user_id: Optional[str] = None) -> str:
     """
     Get an existing user or create a new one
     """
     # If user_id is provided and exists in the store, return it
-    if user_id and user_id in user_store:
+    if user_id and await job_store.user_exists(user_id):
         return user_id
 
-    # Generate a new user ID
-    new_user_id = str(uuid.uuid4())
+    # Generate a new user ID (hex form: no dashes, shorter storage keys)
+    new_user_id = uuid.uuid4().hex
 
-    # Store in the user store with creation timestamp
-    user_store[new_user_id] = {
-        "created_at": datetime.now().isoformat(),
-        "jobs": []
-    }
+    # Store in the user store with creation timestamp (epoch seconds; format on read if ever needed)
+    await job_store.create_user(new_user_id, time.time())
 
     return new_user_id
 
+
+async def get_current_user(x_user_id: Optional[str] = Header(None)) -> str:
+    """
+    Dependency resolving the requesting user's ID from the X-User-ID header
+    Creates a new user if the header is missing or unknown
+    """
+    return await get_or_create_user(x_user_id)
+
+
+@lru_cache(maxsize=10000)
+def _user_response(user_id: str) -> bytes:
+    """A user's response never changes, so render it (as a UserResponse) once per user ID"""
+    return b"{" + VERSION_FRAGMENT + b',"user_id":' + orjson.dumps(user_id) + b"}"
+
 @router.get("/user", response_model=UserResponse)
-async def get_user(x_user_id: Optional[str] = Header(None)):
+async def get_user(user_id: str = Depends(get_current_user)):
     """
     Get user ID - if user exists, return current ID
     If no user exists or ID is not provided, create a new user
     """
-    user_id = get_or_create_user(x_user_id)
-
     # Log user interaction
-    logger.info(f"User {user_id} identified")
+    logger.info("User %s identified", user_id)
 
-    return UserResponse(user_id=user_id, version=settings.API_VERSION)
\ No newline at end of file
+    return Response(content=_user_response(user_id), media_type="application/json")
\ No newline at end of file
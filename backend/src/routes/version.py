@@ -1,15 +1,19 @@
 # src/routes/version.py
-from fastapi import APIRouter
+from fastapi import APIRouter, Response
 
-from src.config import settings
-from src.schemas import VersionResponse
+from src.config import API_VERSION
+from src.schemas import VersionResponse, VERSION_FRAGMENT
 from src.logging import get_logger
 
 logger = get_logger(__name__)
 router = APIRouter()
 
+# The payload never changes for the life of the process, so serialize it once
+_VERSION_BYTES = b"{" + VERSION_FRAGMENT + b"}"
+_VERSION_HEADERS = {"X-API-Version": API_VERSION}
+
 @router.get("/version", response_model=VersionResponse)
 async def get_version():
     """Endpoint to check the current API version"""
-    logger.info(f"Version request received. Returning version: {settings.API_VERSION}")
-    return VersionResponse(version=settings.API_VERSION)
\ No newline at end of file
+    logger.info("Version request received. Returning version: %s", API_VERSION)
+    return Response(content=_VERSION_BYTES, media_type="application/json", headers=_VERSION_HEADERS)
\ No newline at end of file
@@ -1,10 +1,442 @@
 # src/state.py
 """Module for shared application state"""
+import asyncio
+import time
+import zlib
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncContextManager, AsyncIterator, Deque, Dict, List, Optional, Protocol, Set, Tuple, Union
 
-# In-memory user storage
-# In production, this would be in a proper database
-user_store = {}
+import orjson
 
-# In-memory storage for job status and results
-# In production, this would be in a database/cache like Redis
-active_jobs = {}
\ No newline at end of file
+from src.config import settings
+from src.redis_client import get_redis
+from src.transcriber import TRANSCRIPTS
+
+
+JOB_STATUSES = ("queued", "processing", "completed", "error")
+
+
+@dataclass(slots=True)
+class JobState:
+    """
+    A transcription job as held by the job store (slotted, so no per-job __dict__)
+
+    Kept as one object per job rather than column arrays: jobs are always read
+    and updated one at a time, and per-status counts come from the store's status
+    index rather than a scan, so a columnar layout would have nothing to speed up.
+    """
+    user_id: str
+    status: str
+    progress: float
+    created_at: str
+    transcription: Optional[str] = None
+    category: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    # Serialized status response, re-rendered on every state change
+    response_json: Optional[bytes] = None
+
+
+def _job_event(job_id: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the update event published to a job's subscribers (the cached response is left out)"""
+    event = {name: value for name, value in fields.items() if name != "response_json"}
+    event["job_id"] = job_id
+    return event
+
+
+class JobUpdates(Protocol):
+    """Stream of update events for one job, as yielded by JobStore.subscribe"""
+
+    async def get(self) -> Dict[str, Any]: ...
+
+
+class JobStore(Protocol):
+    """
+    Job and user storage used by the routes and workers
+
+    InMemoryJobStore keeps everything in the process; RedisJobStore shares it
+    across uvicorn workers and worker processes, so a job submitted to one
+    worker can be polled from any other.
+    """
+
+    async def create_user(self, user_id: str, created_at: float) -> None: ...
+
+    async def user_exists(self, user_id: str) -> bool: ...
+
+    async def get_user_jobs(self, user_id: str) -> List[Tuple[str, JobState]]: ...
+
+    async def create_job(self, job_id: str, job: JobState) -> None: ...
+
+    async def update_job(self, job_id: str, **fields: Any) -> None: ...
+
+    def subscribe(self, job_id: str) -> AsyncContextManager[JobUpdates]: ...
+
+    async def get_job(self, job_id: str) -> Optional[JobState]: ...
+
+    async def get_job_response(self, job_id: str) -> Optional[bytes]: ...
+
+    async def count_jobs(self) -> int: ...
+
+    async def count_jobs_by_status(self) -> Dict[str, int]: ...
+
+    async def count_users(self) -> int: ...
+
+
+class InMemoryJobStore:
+    """
+    Per-process job and user storage
+
+    Used when Redis isn't configured. State is lost on restart and isn't
+    shared between uvicorn workers. Holds at most max_jobs jobs, evicting the
+    least recently used one when full, and drops jobs job_ttl_seconds after
+    they were created (like the Redis store's key expiry). Job IDs are also
+    indexed by status, so status counts don't walk every job.
+
+    Only ever touched from the event loop thread, so reads and writes take no
+    lock and a single dict is never contended; sharding it wouldn't buy anything.
+    """
+
+    def __init__(self, max_jobs: int, job_ttl_seconds: int):
+        self.max_jobs = max_jobs
+        self.job_ttl_seconds = job_ttl_seconds
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self.jobs: OrderedDict[str, JobState] = OrderedDict()
+        self.job_ids_by_status: Dict[str, Set[str]] = {status: set() for status in JOB_STATUSES}
+        # (expiry, job_id) in creation order; the TTL is fixed, so expiry times are ascending too
+        self.expiries: Deque[Tuple[float, str]] = deque()
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def _remove_job(self, job_id: str) -> None:
+        job = self.jobs.pop(job_id, None)
+        if job is not None:
+            self.job_ids_by_status[job.status].discard(job_id)
+
+    def _expire_jobs(self) -> None:
+        """Drop jobs past their TTL; only looks at the oldest entries, so it's cheap to call often"""
+        now = time.monotonic()
+        while self.expiries and self.expiries[0][0] <= now:
+            self._remove_job(self.expiries.popleft()[1])
+
+    async def create_user(self, user_id: str, created_at: float) -> None:
+        self.users[user_id] = {"created_at": created_at, "jobs": []}
+
+    async def user_exists(self, user_id: str) -> bool:
+        return user_id in self.users
+
+    async def get_user_jobs(self, user_id: str) -> List[Tuple[str, JobState]]:
+        """A user's jobs in submission order, skipping evicted ones"""
+        self._expire_jobs()
+        user = self.users.get(user_id)
+        if user is None:
+            return []
+        # Forget IDs of jobs that are gone, so the list doesn't grow for the life of the process
+        user["jobs"] = [job_id for job_id in user["jobs"] if job_id in self.jobs]
+        return [(job_id, self.jobs[job_id]) for job_id in user["jobs"]]
+
+    async def create_job(self, job_id: str, job: JobState) -> None:
+        self._expire_jobs()
+        self.jobs[job_id] = job
+        self.job_ids_by_status[job.status].add(job_id)
+        self.expiries.append((time.monotonic() + self.job_ttl_seconds, job_id))
+        if len(self.jobs) > self.max_jobs:
+            self._remove_job(next(iter(self.jobs)))
+            # Evicted jobs leave their expiry entries behind; drop them once they dominate
+            if len(self.expiries) > 2 * self.max_jobs + 64:
+                self.expiries = deque(entry for entry in self.expiries if entry[1] in self.jobs)
+
+        user = self.users.get(job.user_id)
+        if user is not None:
+            user["jobs"].append(job_id)
+
+    async def update_job(self, job_id: str, **fields: Any) -> None:
+        job = self.jobs.get(job_id)
+        if job is not None:
+            if "status" in fields:
+                self.job_ids_by_status[job.status].discard(job_id)
+                self.job_ids_by_status[fields["status"]].add(job_id)
+            for name, value in fields.items():
+                setattr(job, name, value)
+
+        for queue in self.subscribers.get(job_id, ()):
+            queue.put_nowait(_job_event(job_id, fields))
+
+    @asynccontextmanager
+    async def subscribe(self, job_id: str) -> AsyncIterator[asyncio.Queue]:
+        """Receive every update made to a job while the context is open"""
+        queue: asyncio.Queue = asyncio.Queue()
+        self.subscribers.setdefault(job_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self.subscribers[job_id]
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[job_id]
+
+    async def get_job(self, job_id: str) -> Optional[JobState]:
+        self._expire_jobs()
+        job = self.jobs.get(job_id)
+        if job is not None:
+            self.jobs.move_to_end(job_id)
+        return job
+
+    async def get_job_response(self, job_id: str) -> Optional[bytes]:
+        """Just the job's pre-rendered status response, for polling"""
+        job = await self.get_job(job_id)
+        return job.response_json if job is not None else None
+
+    async def count_jobs(self) -> int:
+        self._expire_jobs()
+        return len(self.jobs)
+
+    async def count_jobs_by_status(self) -> Dict[str, int]:
+        self._expire_jobs()
+        return {status: len(job_ids) for status, job_ids in self.job_ids_by_status.items()}
+
+    async def count_users(self) -> int:
+        return len(self.users)
+
+
+# Read a user's job list and every job hash in one round trip instead of LRANGE then a pipeline.
+# Jobs expire in submission order, so the leading run of expired IDs is trimmed off the list.
+# Job keys are built inside the script, so this assumes a single (non-cluster) Redis.
+_USER_JOBS_SCRIPT = """
+local job_ids = redis.call('LRANGE', KEYS[1], 0, -1)
+local result = {}
+local expired = 0
+for _, job_id in ipairs(job_ids) do
+    local job = redis.call('HGETALL', 'job:' .. job_id)
+    if #job == 0 then
+        if #result == 0 then
+            expired = expired + 1
+        end
+    else
+        result[#result + 1] = job_id
+        result[#result + 1] = job
+    end
+end
+if expired > 0 then
+    redis.call('LTRIM', KEYS[1], expired, -1)
+end
+return result
+"""
+
+
+# Large text fields are stored zlib-compressed in Redis. The preset dictionary holds the
+# response skeleton and known transcripts, so repeated content shrinks to a few bytes.
+_COMPRESSED_FIELDS = frozenset(("transcription", "category", "response_json"))
+_ZDICT = (
+    '{"version":"","job_id":"","status":"completed","progress":1.0,"transcription":"",'
+    '"category":{"primary_topic":"","sentiment":"positive","neutral","negative",'
+    '"keywords":[],"summary":""},"error":null}'
+    + "".join(TRANSCRIPTS)
+).encode()
+
+
+def _compress(value: Union[str, bytes]) -> bytes:
+    if isinstance(value, str):
+        value = value.encode()
+    compressor = zlib.compressobj(level=9, zdict=_ZDICT)
+    return compressor.compress(value) + compressor.flush()
+
+
+def _decompress(value: bytes) -> bytes:
+    try:
+        decompressor = zlib.decompressobj(zdict=_ZDICT)
+        return decompressor.decompress(value) + decompressor.flush()
+    except zlib.error:
+        # Written before compression was enabled
+        return value
+
+
+class RedisJobStore:
+    """
+    Redis-backed job and user storage, shared across workers
+
+    Layout:
+        job:{id}        hash with the job fields (text ones compressed), expires after JOB_TTL_SECONDS
+        user:{id}       hash with the user's creation time, expires JOB_TTL_SECONDS after their last request
+        user:{id}:jobs  list of the user's job IDs in submission order, expires with user:{id}
+        job:{id}:events pub/sub channel carrying each update made to the job
+        jobs            sorted set of job IDs scored by creation time (for counting)
+        jobs:{status}   sorted set of job IDs in that status, scored by when they entered it
+        users:active    sorted set of user IDs scored by last activity (for counting)
+    """
+
+    def __init__(self, redis, job_ttl_seconds: int):
+        self.redis = redis
+        self.job_ttl_seconds = job_ttl_seconds
+        self._user_jobs_script = redis.register_script(_USER_JOBS_SCRIPT)
+
+    @staticmethod
+    def _encode_job(fields: Dict[str, Any]) -> Dict[str, Any]:
+        """Flatten job fields into hash values, dropping unset ones"""
+        encoded = {}
+        for name, value in fields.items():
+            if value is None:
+                continue
+            if name == "category":
+                value = orjson.dumps(value)
+            encoded[name] = _compress(value) if name in _COMPRESSED_FIELDS else value
+        return encoded
+
+    @staticmethod
+    def _decode_job(raw: Dict[bytes, bytes]) -> Optional[JobState]:
+        """Rebuild a job from a hash, or None if the job doesn't exist"""
+        if not raw:
+            return None
+        fields = {}
+        for key, value in raw.items():
+            name = key.decode()
+            if name in _COMPRESSED_FIELDS:
+                value = _decompress(value)
+            # The rendered response stays bytes, ready to send as is
+            fields[name] = value if name == "response_json" else value.decode()
+        return JobState(
+            user_id=fields["user_id"],
+            status=fields["status"],
+            progress=float(fields["progress"]),
+            created_at=fields["created_at"],
+            transcription=fields.get("transcription"),
+            category=orjson.loads(fields["category"]) if "category" in fields else None,
+            error=fields.get("error"),
+            response_json=fields.get("response_json"),
+        )
+
+    async def create_user(self, user_id: str, created_at: float) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hset(f"user:{user_id}", mapping={"created_at": created_at})
+            pipe.expire(f"user:{user_id}", self.job_ttl_seconds)
+            now = time.time()
+            pipe.zadd("users:active", {user_id: now})
+            # Pruned on every write, so the index is bounded even if nothing ever counts it
+            pipe.zremrangebyscore("users:active", "-inf", now - self.job_ttl_seconds)
+            await pipe.execute()
+
+    async def user_exists(self, user_id: str) -> bool:
+        """Whether the user is known, renewing their TTL so users who only poll aren't forgotten"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            # EXPIRE answers whether the key exists, so checking and renewing take one command
+            pipe.expire(f"user:{user_id}", self.job_ttl_seconds)
+            pipe.zadd("users:active", {user_id: time.time()}, xx=True)
+            exists, _ = await pipe.execute()
+        return bool(exists)
+
+    async def get_user_jobs(self, user_id: str) -> List[Tuple[str, JobState]]:
+        """A user's jobs in submission order, skipping expired ones"""
+        result = await self._user_jobs_script(keys=[f"user:{user_id}:jobs"])
+        jobs = []
+        for job_id, flat_hash in zip(result[::2], result[1::2]):
+            # Scripts return hashes as flat [field, value, ...] arrays
+            job = self._decode_job(dict(zip(flat_hash[::2], flat_hash[1::2])))
+            if job is not None:
+                jobs.append((job_id.decode(), job))
+        return jobs
+
+    async def create_job(self, job_id: str, job: JobState) -> None:
+        key = f"job:{job_id}"
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hset(key, mapping=self._encode_job(
+                {name: getattr(job, name) for name in JobState.__slots__}))
+            pipe.expire(key, self.job_ttl_seconds)
+            # Submitting a job keeps the user (and their job list) alive for as long as the job
+            now = time.time()
+            pipe.rpush(f"user:{job.user_id}:jobs", job_id)
+            pipe.expire(f"user:{job.user_id}:jobs", self.job_ttl_seconds)
+            pipe.expire(f"user:{job.user_id}", self.job_ttl_seconds)
+            pipe.zadd("users:active", {job.user_id: now})
+            pipe.zadd("jobs", {job_id: now})
+            pipe.zadd(f"jobs:{job.status}", {job_id: now})
+            # Drop index entries for expired jobs and users here, not just when they're counted
+            cutoff = now - self.job_ttl_seconds
+            pipe.zremrangebyscore("users:active", "-inf", cutoff)
+            pipe.zremrangebyscore("jobs", "-inf", cutoff)
+            pipe.zremrangebyscore(f"jobs:{job.status}", "-inf", cutoff)
+            await pipe.execute()
+
+    async def update_job(self, job_id: str, **fields: Any) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.hset(f"job:{job_id}", mapping=self._encode_job(fields))
+            if "status" in fields:
+                # The previous status isn't known here, so clear the job from every other index
+                for status in JOB_STATUSES:
+                    if status != fields["status"]:
+                        pipe.zrem(f"jobs:{status}", job_id)
+                now = time.time()
+                pipe.zadd(f"jobs:{fields['status']}", {job_id: now})
+                # Every status index is pruned as jobs enter it, so finished jobs don't pile up between /stats calls
+                pipe.zremrangebyscore(f"jobs:{fields['status']}", "-inf", now - self.job_ttl_seconds)
+            pipe.publish(f"job:{job_id}:events", orjson.dumps(_job_event(job_id, fields)))
+            await pipe.execute()
+
+    @asynccontextmanager
+    async def subscribe(self, job_id: str) -> AsyncIterator["_PubSubUpdates"]:
+        """Receive every update made to a job while the context is open"""
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(f"job:{job_id}:events")
+        try:
+            yield _PubSubUpdates(pubsub)
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+
+    async def get_job(self, job_id: str) -> Optional[JobState]:
+        return self._decode_job(await self.redis.hgetall(f"job:{job_id}"))
+
+    async def get_job_response(self, job_id: str) -> Optional[bytes]:
+        """Just the job's pre-rendered status response, for polling (one field instead of the whole hash)"""
+        raw = await self.redis.hget(f"job:{job_id}", "response_json")
+        return _decompress(raw) if raw is not None else None
+
+    async def count_jobs(self) -> int:
+        # Drop index entries for jobs whose hash has already expired
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore("jobs", "-inf", time.time() - self.job_ttl_seconds)
+            pipe.zcard("jobs")
+            _, count = await pipe.execute()
+        return count
+
+    async def count_jobs_by_status(self) -> Dict[str, int]:
+        # Entries are pruned a TTL after their last transition, by which time the job has expired
+        cutoff = time.time() - self.job_ttl_seconds
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for status in JOB_STATUSES:
+                pipe.zremrangebyscore(f"jobs:{status}", "-inf", cutoff)
+                pipe.zcard(f"jobs:{status}")
+            results = await pipe.execute()
+        return dict(zip(JOB_STATUSES, results[1::2]))
+
+    async def count_users(self) -> int:
+        # Drop users whose keys have expired along with their last job
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.zremrangebyscore("users:active", "-inf", time.time() - self.job_ttl_seconds)
+            pipe.zcard("users:active")
+            _, count = await pipe.execute()
+        return count
+
+
+class _PubSubUpdates:
+    """Queue-like view of a job's pub/sub channel"""
+
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    async def get(self) -> Dict[str, Any]:
+        while True:
+            message = await self.pubsub.get_message(timeout=None)
+            if message is not None:
+                return orjson.loads(message["data"])
+
+
+def _create_job_store() -> JobStore:
+    """Pick the storage backend based on whether Redis is configured"""
+    redis = get_redis()
+    if redis is not None:
+        return RedisJobStore(redis, settings.JOB_TTL_SECONDS)
+    return InMemoryJobStore(settings.MAX_STORED_JOBS, settings.JOB_TTL_SECONDS)
+
+
+# Job and user storage
+# In-memory by default; set REDIS_URL to share state across workers and restarts
+job_store: JobStore = _create_job_store()
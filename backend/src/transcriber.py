@@ -0,0 +1,31 @@
+# src/transcriber.py
+"""
+Speech-to-text stage, run in a pool of worker processes
+
+Kept free of app imports so spawned worker processes start quickly.
+"""
+import random
+import time
+from typing import Optional
+
+# Mock transcriptions, built once instead of on every call
+TRANSCRIPTS = (
+    "I've always been fascinated by cars, especially classic muscle cars from the 60s and 70s. The raw power and beautiful design of those vehicles is just incredible.",
+    "Bald eagles are such majestic creatures. I love watching them soar through the sky and dive down to catch fish. Their white heads against the blue sky is a sight I'll never forget.",
+    "Deep sea diving opens up a whole new world of exploration. The mysterious creatures and stunning coral reefs you encounter at those depths are unlike anything else on Earth."
+)
+
+# Each spawned process imports this module fresh, so every process gets its own independently seeded RNG
+_rng = random.Random()
+
+
+def transcribe_audio(audio_path: Optional[str]) -> str:
+    """
+    Mock speech-to-text. Returns a random transcription.
+    Takes the path of the spooled upload rather than its bytes, so audio isn't pickled across processes.
+    Blocks for the whole call like real CPU/GPU-bound inference would, which is why it runs in a process pool.
+    """
+    # Simulate processing delay
+    time.sleep(_rng.randint(2, 5))
+
+    return TRANSCRIPTS[_rng.randrange(len(TRANSCRIPTS))]
@@ -1,33 +1,65 @@
 # src/utils.py
-from typing import Optional
+import hashlib
+import os
+import random
+import tempfile
+from typing import BinaryIO, Optional, Tuple
 
-from fastapi import Response, Header, HTTPException
 
-from src.config import settings
-from src.logging import get_logger
+# Dedicated RNG for the mocks (job timings, LLM preferences, seed audio). Everything using it
+# runs on the event loop thread, so one instance is enough and the module-level random
+# functions stay untouched.
+mock_rng = random.Random()
+# Reseed in forked app workers (e.g. gunicorn) so they don't all replay the same sequence
+os.register_at_fork(after_in_child=mock_rng.seed)
 
-logger = get_logger(__name__)
 
+# Names the key format produced by content_hash. Shared cache keys are namespaced by it,
+# so changing the hash starts from an empty cache instead of mixing old and new keys.
+CONTENT_HASH_VERSION = "b2b64"
 
-async def verify_version(
-        response: Response,
-        x_api_version: Optional[str] = Header(None)
-):
-    """Dependency to check API version compatibility"""
-    # Always send the current backend version in response headers
-    response.headers["X-API-Version"] = settings.API_VERSION
 
-    # Skip version check if header not provided
-    if not x_api_version:
-        return
+def _content_hasher():
+    """
+    Hasher behind content_hash
 
-    # Validate frontend version matches backend
-    if x_api_version != settings.API_VERSION:
-        logger.warning(
-            f"Version mismatch: Client version {x_api_version} does not match server version {settings.API_VERSION}")
-        raise HTTPException(
-            status_code=426,  # 426 Upgrade Required
-            detail=f"Version mismatch: Client version {x_api_version} does not match server version {settings.API_VERSION}. Please refresh your application."
-        )
+    BLAKE2b is in the standard library and faster than MD5 on large buffers.
+    A 64-bit digest (16 hex chars) is plenty for a cache key and keeps keys short.
+    """
+    return hashlib.blake2b(digest_size=8)
 
-    logger.debug(f"Version check passed: {x_api_version}")
\ No newline at end of file
+
+def content_hash(data: bytes) -> str:
+    """Hash content for use as a cache key"""
+    hasher = _content_hasher()
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+def spool_and_hash(source: BinaryIO, directory: Optional[str] = None, chunk_size: int = 64 * 1024) -> Tuple[str, str]:
+    """
+    Copy an upload to a temp file and hash it in the same pass
+
+    Only one chunk is held in memory at a time, so large audio files are never
+    buffered whole. Blocking; run it in a thread from async code.
+
+    Args:
+        source: File object to read from
+        directory: Where to create the temp file (system temp dir when None)
+        chunk_size: Bytes to read per iteration
+
+    Returns:
+        The content hash (same as content_hash on the full data) and the temp file path
+    """
+    hasher = _content_hasher()
+    with tempfile.NamedTemporaryFile(dir=directory, prefix="audio-", delete=False) as spooled:
+        try:
+            while chunk := source.read(chunk_size):
+                hasher.update(chunk)
+                spooled.write(chunk)
+        except BaseException:
+            # A failed read or a full disk must not leave a partial file behind
+            spooled.close()
+            os.remove(spooled.name)
+            raise
+    return hasher.hexdigest(), spooled.name
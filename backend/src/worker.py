@@ -0,0 +1,471 @@
+# src/worker.py
+"""Job queue and the worker pool that processes transcription jobs"""
+import asyncio
+import multiprocessing
+import os
+import socket
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import replace
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import orjson
+
+from src.cache import (
+    transcription_cache, category_cache, user_preference_cache, get_many, start_cache_sweeper, stop_cache_sweeper
+)
+from src.categorization import categorization_batchers, semantic_category_cache
+from src.config import settings, API_VERSION
+from src.logging import get_logger
+from src.schemas import TranscriptionStatusResponse
+from src.redis_client import get_redis
+from src.state import job_store
+from src.transcriber import transcribe_audio
+from src.utils import mock_rng
+
+logger = get_logger(__name__)
+
+_LLM_PROVIDERS = ("openai", "anthropic")
+
+# Speech-to-text runs in separate processes so jobs transcribe in parallel instead of sharing the GIL
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """Get the transcription process pool, creating it on first use"""
+    global _process_pool
+    if _process_pool is None:
+        # Spawn rather than fork: the parent has an event loop and executor threads running
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.TRANSCRIPTION_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+
+def set_default_executor() -> None:
+    """Give the running event loop a bounded thread pool for asyncio.to_thread and run_in_executor(None, ...)"""
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=settings.IO_THREADS, thread_name_prefix="io")
+    )
+
+
+async def process_transcription(job_id: str, audio_hash: str, audio_path: Optional[str]):
+    """
+    Transcribe audio in the process pool.
+    Callers check transcription_cache first; the result is cached under the audio hash.
+    """
+    global _process_pool
+    loop = asyncio.get_running_loop()
+    pool = _get_process_pool()
+    try:
+        transcription = await loop.run_in_executor(pool, transcribe_audio, audio_path)
+    except BrokenProcessPool:
+        # A child died (e.g. OOM-killed) and the pool refuses all further work; replace it and retry once
+        logger.warning("Transcription process pool broke on job %s, restarting it", job_id)
+        if _process_pool is pool:
+            _process_pool = None
+            pool.shutdown(wait=False, cancel_futures=True)
+        transcription = await loop.run_in_executor(_get_process_pool(), transcribe_audio, audio_path)
+
+    # Cache the result
+    await transcription_cache.set(audio_hash, transcription)
+
+    return transcription
+
+
+async def get_user_model_from_db(user_id: str) -> str:
+    """
+    Mocks a slow and expensive function to simulate fetching a user's preferred LLM model from database
+    Returns either 'openai' or 'anthropic' after a random delay.
+    Call it through user_preference_cache.get_or_set (or compute), which caches the result and
+    coalesces concurrent lookups for the same user.
+    """
+    # Simulate slow database query
+    logger.info("Expensive database query for user %s LLM preference", user_id)
+    await asyncio.sleep(mock_rng.randint(5, 8))  # Simulate slow DB query
+
+    # Get random preference
+    preference = _LLM_PROVIDERS[mock_rng.randrange(len(_LLM_PROVIDERS))]
+
+    logger.info("User %s LLM preference set to %s", user_id, preference)
+    return preference
+
+
+async def _categorize(transcription: str, llm_provider: str) -> Optional[Dict[str, Any]]:
+    """Categorize a transcription, batched with other jobs categorizing at the same time"""
+    category = await categorization_batchers[llm_provider].submit(transcription)
+    return category.model_dump() if category else None
+
+
+async def update_job_status(job_id: str, **fields: Any) -> None:
+    """
+    Apply a state change to a job together with its re-rendered status response,
+    so status reads can return the response as-is
+    """
+    job = await job_store.get_job(job_id)
+    if job is None:
+        # Evicted from the store while it was running
+        return
+    response_json = TranscriptionStatusResponse.render_job(job_id, replace(job, **fields), API_VERSION)
+    await job_store.update_job(job_id, response_json=response_json, **fields)
+
+
+def remove_audio(audio_path: Optional[str]) -> None:
+    """Delete a job's spooled upload once the job no longer needs it"""
+    if audio_path is None:
+        return
+    try:
+        os.remove(audio_path)
+    except FileNotFoundError:
+        pass
+
+
+async def process_transcription_job(job_id: str, user_id: str, audio_hash: str, audio_path: Optional[str] = None):
+    """
+    Process a single transcription job, called by a worker
+    Updates job status at various points
+    audio_hash is computed while the upload is spooled; audio_path is None when there was no upload.
+    The caller removes the audio afterwards, unless the job is interrupted and requeued.
+    """
+    try:
+        # Update job to processing status
+        await update_job_status(job_id, status="processing", progress=0.1)
+
+        # Look up everything this job might reuse in one batch instead of one cache call per step.
+        # Identical audio gives an identical transcription, so the audio hash keys its category too.
+        cached_transcription, cached_category, cached_preference = await get_many(
+            (transcription_cache, audio_hash),
+            (category_cache, audio_hash),
+            (user_preference_cache, user_id)
+        )
+
+        # Simulate initial processing delay
+        await asyncio.sleep(mock_rng.uniform(0.5, 1))
+        await update_job_status(job_id, progress=0.3)
+
+        # Get transcription, reusing the cached one for identical audio
+        if cached_transcription:
+            logger.info("Using cached transcription for job %s", job_id)
+            transcription = cached_transcription
+        else:
+            transcription = await process_transcription(job_id, audio_hash, audio_path)
+
+        # Update job with transcription
+        await update_job_status(job_id, transcription=transcription, progress=0.5)
+
+        # Without a cached categorization for this audio, reuse the category of a
+        # transcription that means the same thing
+        embedding = None
+        if not cached_category and semantic_category_cache is not None:
+            try:
+                embedding = await semantic_category_cache.embed(transcription)
+                cached_category = semantic_category_cache.get(embedding)
+                if cached_category:
+                    # Exact repeats of this transcription can skip the embedding next time
+                    await category_cache.set(audio_hash, cached_category)
+            except Exception as e:
+                logger.warning("Semantic cache lookup failed for job %s: %s", job_id, e)
+
+        if cached_category:
+            logger.info("Using cached categorization for job %s", job_id)
+            await update_job_status(job_id, category=cached_category, progress=0.9)
+        else:
+            # Get the user's preferred LLM model, from the cache when we have it
+            logger.info("Getting LLM preference for user %s", user_id)
+            llm_provider = cached_preference or await user_preference_cache.compute(
+                user_id, lambda: get_user_model_from_db(user_id))
+            logger.info("User %s prefers %s", user_id, llm_provider)
+
+            await update_job_status(job_id, progress=0.7)
+
+            # Categorize the transcription using the appropriate LLM
+            logger.info("Categorizing transcription for job %s using %s", job_id, llm_provider)
+            try:
+                # Cached on success; jobs categorizing the same transcription at once share one request.
+                # get_many already missed this key, so skip straight to computing it
+                category_dict = await category_cache.compute(
+                    audio_hash, lambda: _categorize(transcription, llm_provider))
+                if category_dict:
+                    await update_job_status(job_id, category=category_dict)
+                    if embedding is not None:
+                        semantic_category_cache.set(embedding, category_dict)
+
+                    logger.info("Categorization successful for job %s: %s", job_id, category_dict["primary_topic"])
+                else:
+                    logger.warning("Categorization failed for job %s", job_id)
+            except Exception as e:
+                logger.error("Error during categorization for job %s: %s", job_id, e)
+
+            await update_job_status(job_id, progress=0.9)
+
+        await asyncio.sleep(mock_rng.uniform(0.5, 1))
+
+        # Update job with finished status
+        await update_job_status(job_id, status="completed", progress=1.0)
+
+        # Log job completion with user ID
+        logger.info("Job %s completed for user %s", job_id, user_id)
+    except Exception as e:
+        # Update job with error status
+        await update_job_status(job_id, status="error", error=str(e))
+
+        # Log error with user ID
+        logger.error("Error processing job %s for user %s: %s", job_id, user_id, e)
+
+
+class JobQueueFullError(Exception):
+    """Raised when the job queue is at capacity and can't take more work"""
+
+
+class InMemoryJobQueue:
+    """Bounded per-process job queue, used when Redis isn't configured"""
+
+    # Jobs don't outlive the process, so interrupted ones can't be handed to another worker
+    durable = False
+
+    def __init__(self, max_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+
+    async def start(self, on_recovered: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+        # Nothing survives a restart, so there's nothing to recover
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def put(self, job: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFullError(f"Job queue is full ({self.queue.maxsize} jobs waiting)")
+
+    async def get(self) -> Optional[Dict[str, Any]]:
+        return await self.queue.get()
+
+    async def ack(self, job: Dict[str, Any]) -> None:
+        pass
+
+    async def requeue(self, job: Dict[str, Any]) -> bool:
+        return False
+
+
+class RedisJobQueue:
+    """
+    Redis list-backed job queue, so any worker process can pick up a job
+
+    Taking a job moves it atomically (BLMOVE) into this consumer's processing
+    list, and it's only removed from there once processed (ack), so a job held
+    by a worker that dies isn't lost. Each consumer keeps a heartbeat key alive;
+    on startup, jobs in processing lists whose consumer has stopped heartbeating
+    are claimed and pushed back onto the queue.
+    """
+
+    durable = True
+
+    def __init__(self, redis, max_size: int, key: str = "queue:transcription", poll_timeout: int = 5,
+                 heartbeat_seconds: int = 30):
+        self.redis = redis
+        self.max_size = max_size
+        self.key = key
+        self.poll_timeout = poll_timeout
+        self.heartbeat_seconds = heartbeat_seconds
+        self.consumer_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.processing_key = f"{key}:processing:{self.consumer_id}"
+        self.heartbeat_key = f"{key}:consumer:{self.consumer_id}"
+        # Raw queue entries of jobs taken by this consumer, needed to remove them on ack
+        self._taken: Dict[str, bytes] = {}
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    async def start(self, on_recovered: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+        """
+        Start heartbeating and push jobs held by dead consumers back onto the queue
+
+        Args:
+            on_recovered: Called with each recovered job while it's still claimed by this
+                consumer, before any other worker can take it from the queue
+        """
+        await self.redis.set(self.heartbeat_key, 1, ex=self.heartbeat_seconds)
+        self._heartbeat = asyncio.create_task(self._keep_alive())
+
+        async for processing_key in self.redis.scan_iter(match=f"{self.key}:processing:*"):
+            consumer_id = processing_key.decode().rsplit(":processing:", 1)[1]
+            if await self.redis.exists(f"{self.key}:consumer:{consumer_id}"):
+                continue
+            # Claim into this consumer's own processing list first, so a failure here leaves the job recoverable
+            while (item := await self.redis.lmove(processing_key, self.processing_key, "RIGHT", "LEFT")) is not None:
+                await on_recovered(orjson.loads(item))
+                await self._release(item)
+
+    async def stop(self) -> None:
+        """Stop heartbeating, handing back anything still in this consumer's processing list"""
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        while await self.redis.lmove(self.processing_key, self.key, "RIGHT", "LEFT") is not None:
+            pass
+        await self.redis.delete(self.heartbeat_key)
+
+    async def _keep_alive(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds / 3)
+            try:
+                await self.redis.set(self.heartbeat_key, 1, ex=self.heartbeat_seconds)
+            except Exception as e:
+                logger.warning("Failed to refresh job queue heartbeat: %s", e)
+
+    async def put(self, job: Dict[str, Any]) -> None:
+        # Best-effort bound: concurrent producers can overshoot by a few entries
+        if await self.redis.llen(self.key) >= self.max_size:
+            raise JobQueueFullError(f"Job queue is full ({self.max_size} jobs waiting)")
+        await self.redis.rpush(self.key, orjson.dumps(job))
+
+    async def get(self) -> Optional[Dict[str, Any]]:
+        # Block for a bounded time so shutdown isn't stuck on an idle queue
+        item = await self.redis.blmove(self.key, self.processing_key, self.poll_timeout, "LEFT", "RIGHT")
+        if item is None:
+            return None
+        job = orjson.loads(item)
+        self._taken[job["job_id"]] = item
+        return job
+
+    async def ack(self, job: Dict[str, Any]) -> None:
+        """Remove a processed job from this consumer's processing list"""
+        item = self._taken.pop(job["job_id"], None)
+        if item is not None:
+            await self.redis.lrem(self.processing_key, 1, item)
+
+    async def requeue(self, job: Dict[str, Any]) -> bool:
+        """Put an interrupted job back at the front of the queue for another worker"""
+        item = self._taken.pop(job["job_id"], None)
+        if item is None:
+            return False
+        await self._release(item)
+        return True
+
+    async def _release(self, item: bytes) -> None:
+        """Move an entry from this consumer's processing list to the front of the queue"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lrem(self.processing_key, 1, item)
+            pipe.lpush(self.key, item)
+            await pipe.execute()
+
+
+def _create_job_queue():
+    """Pick the queue backend based on whether Redis is configured"""
+    redis = get_redis()
+    if redis is not None:
+        return RedisJobQueue(redis, settings.JOB_QUEUE_MAX_SIZE)
+    return InMemoryJobQueue(settings.JOB_QUEUE_MAX_SIZE)
+
+
+job_queue = _create_job_queue()
+
+# Running worker tasks, kept so they can be cancelled on shutdown
+_workers: List[asyncio.Task] = []
+
+
+async def enqueue_job(job_id: str, user_id: str, audio_hash: str, audio_path: Optional[str] = None) -> None:
+    """
+    Queue a job for the worker pool, raising JobQueueFullError when at capacity
+    Only the audio's hash and spooled file path are queued, never the audio itself.
+    """
+    await job_queue.put({
+        "job_id": job_id,
+        "user_id": user_id,
+        "audio_hash": audio_hash,
+        "audio_path": audio_path,
+    })
+
+
+async def _abandon_job(job: Dict[str, Any]) -> None:
+    """Hand a job interrupted by shutdown back to the queue, or fail it if nothing else can pick it up"""
+    job_id = job["job_id"]
+    try:
+        if job_queue.durable:
+            # Reset the status before requeueing, so it can't overwrite a worker that takes the job straight away
+            await update_job_status(job_id, status="queued", progress=0.0)
+            if await job_queue.requeue(job):
+                logger.warning("Requeued job %s interrupted by shutdown", job_id)
+                return
+        await update_job_status(job_id, status="error",
+                                error="The server restarted while this job was processing, please try again")
+        logger.warning("Failed job %s interrupted by shutdown", job_id)
+    except Exception as e:
+        logger.error("Failed to release job %s interrupted by shutdown: %s", job_id, e)
+        if job_queue.durable:
+            # Still in this consumer's processing list, so the next worker to start recovers it and needs the audio
+            return
+    # Failed, or dropped with the in-memory queue: nothing will read the audio again
+    remove_audio(job["audio_path"])
+
+
+async def _worker_loop(worker_id: int) -> None:
+    """Pull jobs off the queue and process them one at a time"""
+    while True:
+        try:
+            job = await job_queue.get()
+            if job is None:
+                continue
+            try:
+                await process_transcription_job(job["job_id"], job["user_id"], job["audio_hash"], job["audio_path"])
+            except asyncio.CancelledError:
+                await asyncio.shield(_abandon_job(job))
+                raise
+            # Only a finished (completed or failed) job gives up its audio and leaves the queue
+            remove_audio(job["audio_path"])
+            await job_queue.ack(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # process_transcription_job records its own failures; this only guards the loop itself
+            logger.error("Worker %s failed to take a job: %s", worker_id, e)
+            await asyncio.sleep(1)
+
+
+async def _reset_recovered_job(job: Dict[str, Any]) -> None:
+    """Show a job left behind by a worker that died mid-job as waiting again, before it's requeued"""
+    logger.warning("Recovered job %s from a stopped worker", job["job_id"])
+    await update_job_status(job["job_id"], status="queued", progress=0.0)
+
+
+async def start_workers(concurrency: Optional[int] = None) -> None:
+    """Start the worker pool on the running event loop"""
+    await job_queue.start(_reset_recovered_job)
+
+    concurrency = concurrency or settings.WORKER_CONCURRENCY
+    for worker_id in range(concurrency):
+        _workers.append(asyncio.create_task(_worker_loop(worker_id)))
+    logger.info("Started %s transcription workers", concurrency)
+
+
+async def stop_workers() -> None:
+    """Cancel the worker pool and wait for it to wind down; interrupted jobs are requeued or failed"""
+    if not _workers:
+        return
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    await job_queue.stop()
+
+    global _process_pool
+    if _process_pool is not None:
+        # Don't block the event loop waiting on children; queued calls are cancelled and the workers exit on their own
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+async def run_workers() -> None:
+    """Run a standalone worker process (requires REDIS_URL so jobs come from the shared queue)"""
+    if get_redis() is None:
+        raise RuntimeError("REDIS_URL must be set to run standalone workers")
+    set_default_executor()
+    start_cache_sweeper()
+    await start_workers()
+    try:
+        await asyncio.gather(*_workers)
+    finally:
+        await stop_workers()
+        await stop_cache_sweeper()
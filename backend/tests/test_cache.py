@@ -0,0 +1,86 @@
+import asyncio
+
+from src.cache import Cache
+
+
+def test_concurrent_callers_share_one_getter_call():
+    async def scenario():
+        cache = Cache[str, str](name="test")
+        calls = []
+
+        async def getter():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "value"
+
+        results = await asyncio.gather(*(cache.get_or_set("key", getter) for _ in range(5)))
+        return results, len(calls)
+
+    results, calls = asyncio.run(scenario())
+    assert results == ["value"] * 5
+    assert calls == 1
+
+
+def test_waiter_retries_when_computing_caller_is_cancelled():
+    async def scenario():
+        cache = Cache[str, str](name="test")
+        calls = []
+
+        async def getter():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            return "value"
+
+        owner = asyncio.create_task(cache.get_or_set("key", getter))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(cache.get_or_set("key", getter)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        owner.cancel()
+
+        results = await asyncio.gather(*waiters)
+        owner_result = await asyncio.gather(owner, return_exceptions=True)
+        return results, owner_result, len(calls), cache
+
+    results, owner_result, calls, cache = asyncio.run(scenario())
+    # The waiters weren't cancelled, so they get the value from one new getter call
+    assert results == ["value"] * 3
+    assert isinstance(owner_result[0], asyncio.CancelledError)
+    assert calls == 2
+    assert cache._inflight == {}
+
+
+def test_cancelled_waiter_does_not_cancel_the_computation():
+    async def scenario():
+        cache = Cache[str, str](name="test")
+
+        async def getter():
+            await asyncio.sleep(0.05)
+            return "value"
+
+        owner = asyncio.create_task(cache.get_or_set("key", getter))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_set("key", getter))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        return await owner, await cache.get("key")
+
+    assert asyncio.run(scenario()) == ("value", "value")
+
+
+def test_compute_skips_the_lookup_but_still_single_flights():
+    async def scenario():
+        cache = Cache[str, str](name="test")
+        calls = []
+
+        async def getter():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "value"
+
+        results = await asyncio.gather(*(cache.compute("key", getter) for _ in range(3)))
+        return results, len(calls), cache.get_stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert results == ["value"] * 3
+    assert calls == 1
+    assert stats["misses"] == 0
@@ -0,0 +1,90 @@
+import asyncio
+
+import fakeredis
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+import src.worker as worker
+from src.app import app
+from src.config import settings
+from src.state import job_store
+from src.worker import InMemoryJobQueue, JobQueueFullError, RedisJobQueue
+
+
+def _job(job_id):
+    return {"job_id": job_id, "user_id": "user", "audio_hash": "hash", "audio_path": None}
+
+
+def test_start_recovers_jobs_from_dead_consumers_only():
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis()
+        queue = RedisJobQueue(redis, max_size=10)
+        # A consumer that stopped heartbeating, and one that's still alive
+        await redis.rpush(f"{queue.key}:processing:dead", orjson.dumps(_job("a")), orjson.dumps(_job("b")))
+        await redis.rpush(f"{queue.key}:processing:alive", orjson.dumps(_job("c")))
+        await redis.set(f"{queue.key}:consumer:alive", 1)
+
+        seen = []
+
+        async def on_recovered(job):
+            # Called before the job is back where another worker could take it
+            seen.append((job["job_id"], await redis.llen(queue.key)))
+
+        await queue.start(on_recovered)
+        queued = [orjson.loads(item)["job_id"] for item in await redis.lrange(queue.key, 0, -1)]
+        leftovers = {
+            key.decode(): await redis.llen(key) async for key in redis.scan_iter(match=f"{queue.key}:processing:*")
+        }
+        await queue.stop()
+        return seen, queued, leftovers
+
+    seen, queued, leftovers = asyncio.run(scenario())
+    assert seen == [("b", 0), ("a", 1)]
+    # Recovered jobs go back in their original order, ahead of anything newer
+    assert queued == ["a", "b"]
+    assert leftovers == {"queue:transcription:processing:alive": 1}
+
+
+def test_requeue_hands_a_taken_job_back():
+    async def scenario():
+        redis = fakeredis.FakeAsyncRedis()
+        queue = RedisJobQueue(redis, max_size=10)
+        await queue.put(_job("a"))
+        job = await queue.get()
+        requeued = await queue.requeue(job)
+        return requeued, await redis.llen(queue.key), await redis.llen(queue.processing_key)
+
+    assert asyncio.run(scenario()) == (True, 1, 0)
+
+
+@pytest.mark.parametrize("make_queue", [
+    lambda: InMemoryJobQueue(max_size=1),
+    lambda: RedisJobQueue(fakeredis.FakeAsyncRedis(), max_size=1),
+], ids=["in-memory", "redis"])
+def test_put_raises_when_queue_is_full(make_queue):
+    async def scenario():
+        queue = make_queue()
+        await queue.put(_job("a"))
+        with pytest.raises(JobQueueFullError):
+            await queue.put(_job("b"))
+
+    asyncio.run(scenario())
+
+
+def test_transcribe_rejects_with_429_and_removes_audio_when_queue_is_full(monkeypatch, tmp_path):
+    # No lifespan, so no workers start and the one-slot queue stays full
+    monkeypatch.setattr(worker, "job_queue", InMemoryJobQueue(max_size=1))
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    client = TestClient(app)
+    user_id = client.get("/user").json()["user_id"]
+    headers = {"X-API-Version": settings.API_VERSION, "X-User-ID": user_id}
+
+    accepted = client.post("/transcribe", headers=headers, files={"audio": ("a.wav", b"first")})
+    assert accepted.status_code == 200
+    rejected = client.post("/transcribe", headers=headers, files={"audio": ("b.wav", b"second")})
+    assert rejected.status_code == 429
+    # Only the queued job's upload is still on disk
+    assert [path.read_bytes() for path in tmp_path.iterdir()] == [b"first"]
+    statuses = [job.status for _, job in asyncio.run(job_store.get_user_jobs(user_id))]
+    assert statuses == ["queued", "error"]